@@ -1,95 +1,404 @@
-from flask import Flask, request, jsonify, redirect, Response, render_template_string
+from flask import Flask, request, jsonify, redirect, Response, render_template_string, g
 from flask_cors import CORS
-from ytmusicapi import YTMusic
 import os
-import yt_dlp
-import requests
-import certifi
-import ssl
 import json
 from pathlib import Path
 import tempfile
 import hashlib
+import shutil
+import subprocess
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from stream_cache import StreamUrlCache
+from transcription_jobs import TranscriptionQueue
+from whisper_profile import WhisperProfile, lyrics_lines
+from parallel_whisper import ParallelTranscriber
+from response_cache import ResponseCache, make_backend
+from search_index import PrefixIndex, ClientSearches
+from audio_cache import AudioCache, parse_range, parse_content_range
+from prefetch import Prefetcher
+from thumbnails import ThumbnailResolver, thumbnail_url, valid_video_id
+from lyrics_store import LyricsStore
+from share_pages import Template, PageCache
+from share_store import ShareStore, make_share_backend
+from spotify_meta import SpotifyToken, SpotifyTracks, valid_track_id
+from metrics import registry, stage, trace_request, Gauge
+from tracks import TrackTable, parse_fields, project, dumps
+
+if __name__ == '__main__' and __spec__ is None:
+    # Started as `python app.py`. spawn (the Whisper pool) re-runs a plain
+    # main script in every worker, building a second server in each one, but
+    # leaves a package-style __main__ alone; the workers then only import
+    # parallel_whisper, which has nothing to run at import.
+    import importlib.util
+    __spec__ = importlib.util.spec_from_file_location('__main__', __file__)
 
 app = Flask(__name__)
 CORS(app)
 
-ytmusic = YTMusic()
+# LOG_LEVEL=DEBUG shows per-step progress; REQUEST_LOG=1 adds one JSON line
+# per request with its duration and stage timings
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+)
+log = logging.getLogger('nova')
+access_log = logging.getLogger('nova.access')
+REQUEST_LOG = os.environ.get('REQUEST_LOG', '').lower() in ('1', 'true', 'yes', 'on')
+
+http_request_seconds = registry.histogram(
+    'nova_http_request_duration_seconds', 'Time until response headers, per route', ('method', 'route', 'status')
+)
+active_streams = registry.gauge('nova_active_streams', 'Audio streams currently being served', ('mode',))
+stream_bytes = registry.counter('nova_stream_bytes_total', 'Audio bytes sent to clients', ('mode',))
+transcription_rtf = registry.histogram(
+    'nova_transcription_realtime_factor', 'Whisper processing time / audio duration',
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5),
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if REQUEST_LOG:
+        g.request_stages = trace_request()
+
+@app.after_request
+def record_request_timing(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_request_seconds.observe(elapsed, method=request.method, route=route, status=response.status_code)
+    if REQUEST_LOG and access_log.isEnabledFor(logging.INFO):
+        access_log.info(json.dumps({
+            'method': request.method,
+            'route': route,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(elapsed * 1000, 2),
+            'stages': g.get('request_stages') or {},
+        }))
+    return response
 
-# Store Spotify token (in production, use Redis or database)
-spotify_token_cache = None
+# yt_dlp, ytmusicapi and requests are imported where they are first used so
+# the server is listening (and /api/health answers) before they load; see
+# warm_clients() and bench_startup.py
+ytmusic = None
+ytmusic_lock = threading.Lock()
+
+def get_ytmusic():
+    """The YouTube Music client, built on first use (only once)"""
+    global ytmusic
+    if ytmusic is None:
+        with ytmusic_lock:
+            if ytmusic is None:
+                from ytmusicapi import YTMusic
+                ytmusic = YTMusic()
+    return ytmusic
 
 # Create cache directory for lyrics
 LYRICS_CACHE_DIR = Path(tempfile.gettempdir()) / 'nova_lyrics_cache'
 LYRICS_CACHE_DIR.mkdir(exist_ok=True)
 
-# Global variable to hold Whisper model (lazy load)
+# Transcribed lyrics, all in one SQLite file. Old per-video JSON files in
+# LYRICS_LEGACY_DIR are imported in the background (and on first read) and
+# deleted once stored. By default that is LYRICS_CACHE_DIR, but only for the
+# default database: a process with its own LYRICS_DB_PATH (a test, a bench)
+# must not take over the shared files unless LYRICS_LEGACY_DIR says so.
+LYRICS_DB_PATH = os.environ.get('LYRICS_DB_PATH')
+LYRICS_LEGACY_DIR = os.environ.get('LYRICS_LEGACY_DIR', None if LYRICS_DB_PATH else str(LYRICS_CACHE_DIR))
+lyrics_store = LyricsStore(
+    LYRICS_DB_PATH or LYRICS_CACHE_DIR / 'lyrics.sqlite3',
+    max_bytes=int(os.environ.get('LYRICS_CACHE_MAX_BYTES', 512 * 1024 ** 2)),
+    memory_items=int(os.environ.get('LYRICS_MEMORY_ITEMS', 512)),
+    legacy_dir=LYRICS_LEGACY_DIR or None,
+)
+
+def migrate_legacy_lyrics():
+    count = lyrics_store.migrate()
+    if count:
+        log.info("✓ Imported %s cached lyrics files into %s", count, lyrics_store.path)
+
+if lyrics_store.legacy_dir is not None and any(lyrics_store.legacy_dir.glob('*.json')):
+    threading.Thread(target=migrate_legacy_lyrics, daemon=True).start()
+
+# Formatted /api/search and /api/recommendations responses. The memory backend
+# is per process; sqlite or redis lets every gunicorn worker share one cache.
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 600))
+RECOMMENDATIONS_CACHE_TTL = int(os.environ.get('RECOMMENDATIONS_CACHE_TTL', 3600))
+response_cache = ResponseCache(
+    make_backend(
+        os.environ.get('RESPONSE_CACHE_BACKEND', 'memory'),
+        url=os.environ.get('RESPONSE_CACHE_URL'),
+        max_size=int(os.environ.get('RESPONSE_CACHE_SIZE', 2048)),
+    ),
+    stale_ttl=int(os.environ.get('RESPONSE_CACHE_STALE_TTL', 3600)),
+)
+
+# Tracks seen in search/recommendation results, for instant prefix matches
+# while a user is still typing, and per-client tracking of superseded queries
+search_index = PrefixIndex(max_tracks=int(os.environ.get('SEARCH_INDEX_SIZE', 5000)))
+client_searches = ClientSearches()
+# Normalized search/recommendation tracks by videoId, reused across responses
+track_table = TrackTable(max_size=int(os.environ.get('TRACK_TABLE_SIZE', 20000)))
+
+def json_response(payload, status=200):
+    """Like jsonify, but through the faster encoder in tracks.dumps"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+# Whisper model and settings (WHISPER_MODEL, WHISPER_CPU_THREADS, ... in .env)
+whisper_profile = WhisperProfile.from_env()
 whisper_model = None
+whisper_model_lock = threading.Lock()
 
 def get_whisper_model():
-    """Lazy load Whisper model"""
+    """Lazy load Whisper model (only once, even under concurrent requests)"""
     global whisper_model
     if whisper_model is None:
-        try:
-            from faster_whisper import WhisperModel
-            print("Loading Whisper model (small - better accuracy for multi-language)...")
-            # Use 'base' model for better accuracy, especially for non-English songs
-            # Models: tiny (fastest) < base (balanced) < small (best accuracy but slower)
-            whisper_model = WhisperModel("base", device="cpu", compute_type="int8")
-            print("✓ Whisper model loaded!")
-        except Exception as e:
-            print(f"Error loading Whisper model: {e}")
+        with whisper_model_lock:
+            if whisper_model is None:
+                try:
+                    log.info("Loading Whisper model (%s, %s)...", whisper_profile.model, whisper_profile.compute_type)
+                    whisper_model = whisper_profile.load()
+                    log.info("✓ Whisper model loaded!")
+                except Exception as e:
+                    log.error("Error loading Whisper model: %s", e)
     return whisper_model
 
+# WHISPER_PARALLEL_WORKERS > 1 splits long songs at pauses and transcribes the
+# pieces in that many processes (each with its own model copy)
+WHISPER_PARALLEL_WORKERS = int(os.environ.get('WHISPER_PARALLEL_WORKERS', 0))
+parallel_transcriber = ParallelTranscriber(
+    whisper_profile,
+    WHISPER_PARALLEL_WORKERS,
+    min_chunk_seconds=float(os.environ.get('WHISPER_PARALLEL_MIN_CHUNK_SECONDS', 30)),
+) if WHISPER_PARALLEL_WORKERS > 1 else None
+
+def preload_whisper_model():
+    """Load the model in the background so startup and /api/health stay fast"""
+    threading.Thread(target=get_whisper_model, name='whisper-preload', daemon=True).start()
+    if parallel_transcriber is not None:
+        threading.Thread(target=parallel_transcriber.warm, name='whisper-pool-preload', daemon=True).start()
+
+if os.environ.get('WHISPER_PRELOAD', '').lower() in ('1', 'true', 'yes', 'on'):
+    preload_whisper_model()
+
+AUDIO_MIME_TYPES = {
+    'm4a': 'audio/mp4',
+    'mp4': 'audio/mp4',
+    'webm': 'audio/webm',
+    'mp3': 'audio/mpeg',
+    'opus': 'audio/ogg',
+}
+
+AUDIO_YDL_OPTS = {
+    'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': False,
+    'nocheckcertificate': False,
+    'prefer_insecure': False,
+    'legacy_server_connect': True,
+}
+
+# Threads of the batch resolver keep one YoutubeDL each (it isn't thread-safe)
+# instead of building a new extractor for every video
+_extractors = threading.local()
+
+def init_extractor():
+    import yt_dlp
+    _extractors.ydl = yt_dlp.YoutubeDL(AUDIO_YDL_OPTS)
+
+def resolve_audio(video_id):
+    """Run yt-dlp once and pick the best audio URL for a video"""
+    url = f'https://www.youtube.com/watch?v={video_id}'
+    ydl = getattr(_extractors, 'ydl', None)
+    log.debug("Extracting info for video %s...", video_id)
+    if ydl is not None:
+        with stage('ytdlp_extract'):
+            info = ydl.extract_info(url, download=False)
+    else:
+        import yt_dlp
+        with stage('ytdlp_extract'), yt_dlp.YoutubeDL(AUDIO_YDL_OPTS) as ydl:
+            info = ydl.extract_info(url, download=False)
+    
+    fmt = info
+    if not info.get('url'):
+        candidates = info.get('requested_formats') or info.get('formats') or []
+        fmt = next((f for f in candidates if f.get('acodec') != 'none' and f.get('url')), {})
+    
+    audio_url = fmt.get('url')
+    if not audio_url:
+        raise LookupError('No audio URL found')
+    
+    ext = fmt.get('ext') or info.get('ext')
+    return {
+        'url': audio_url,
+        'content_type': AUDIO_MIME_TYPES.get(ext, 'audio/webm'),
+        'title': info.get('title'),
+        'duration': info.get('duration'),
+        'http_headers': fmt.get('http_headers') or info.get('http_headers') or {},
+        'format': {
+            'format_id': fmt.get('format_id'),
+            'ext': ext,
+            'acodec': fmt.get('acodec'),
+            'abr': fmt.get('abr'),
+            'filesize': fmt.get('filesize') or fmt.get('filesize_approx'),
+        },
+    }
+
+def make_session(pool_size):
+    """requests.Session that keeps up to pool_size connections alive per host"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class LazySession:
+    """make_session(pool_size), created the first time any attribute is used"""
+    
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+    
+    def get_session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = make_session(self.pool_size)
+        return self._session
+    
+    def __getattr__(self, name):
+        return getattr(self.get_session(), name)
+
+# One keep-alive pool per upstream service instead of a new TCP+TLS
+# handshake on every request
+audio_session = LazySession(int(os.environ.get('AUDIO_POOL_SIZE', 64)))
+thumbnail_session = LazySession(int(os.environ.get('THUMBNAIL_POOL_SIZE', 16)))
+spotify_session = LazySession(int(os.environ.get('SPOTIFY_POOL_SIZE', 8)))
+
+# Server-side Spotify access for share pages. With SPOTIFY_CLIENT_ID/SECRET
+# the server keeps its own token fresh; otherwise it uses the token the app
+# pushes to /api/set-token (or SPOTIFY_TOKEN).
+spotify_token = SpotifyToken(
+    spotify_session,
+    client_id=os.environ.get('SPOTIFY_CLIENT_ID'),
+    client_secret=os.environ.get('SPOTIFY_CLIENT_SECRET'),
+    static_token=os.environ.get('SPOTIFY_TOKEN'),
+)
+spotify_tracks = SpotifyTracks(
+    spotify_session,
+    spotify_token,
+    ttl=int(os.environ.get('SPOTIFY_TRACK_TTL', 24 * 3600)),
+    negative_ttl=int(os.environ.get('SPOTIFY_NEGATIVE_TTL', 600)),
+)
+
+# Best existing thumbnail quality per video, probed once and kept on disk
+thumbnail_resolver = ThumbnailResolver(
+    thumbnail_session,
+    db_path=os.environ.get('THUMBNAIL_CACHE_PATH', Path(tempfile.gettempdir()) / 'nova_thumbnails.sqlite3'),
+)
+# How long search/recommendations wait for uncached thumbnail probes
+THUMBNAIL_PAGE_TIMEOUT = float(os.environ.get('THUMBNAIL_PAGE_TIMEOUT', 1.5))
+
+# Bytes per proxied audio chunk; larger means fewer Python iterations per MB
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 128 * 1024))
+
+# Proxied audio can be kept on disk so replays and seeks of hot tracks are
+# served locally. Off unless AUDIO_CACHE_MAX_BYTES is set: it writes up to that
+# many bytes under AUDIO_CACHE_DIR (the system temp dir by default)
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get('AUDIO_CACHE_MAX_BYTES', 0))
+audio_cache = AudioCache(
+    os.environ.get('AUDIO_CACHE_DIR', Path(tempfile.gettempdir()) / 'nova_audio_cache'),
+    AUDIO_CACHE_MAX_BYTES,
+) if AUDIO_CACHE_MAX_BYTES > 0 else None
+
+# Resolved audio URLs are reused until googlevideo expires them, so seeks
+# (one Range request each) and repeat plays skip the yt-dlp extraction
+stream_url_cache = StreamUrlCache(
+    resolve_audio,
+    max_size=int(os.environ.get('STREAM_URL_CACHE_SIZE', 512)),
+)
+
+def normalize_query(query):
+    """Cache key for a search: case and extra whitespace don't matter"""
+    return ' '.join(query.lower().split())
+
+def fetch_search_results(query):
+    """Search YouTube Music and format the results like Spotify tracks"""
+    with stage('ytmusic_search'):
+        results = get_ytmusic().search(query, filter='songs', limit=20)
+    
+    # Probe the whole page's thumbnails at once instead of guessing maxresdefault
+    with stage('thumbnails'):
+        thumbnails = thumbnail_resolver.resolve_many(
+            [track.get('videoId') for track in results], timeout=THUMBNAIL_PAGE_TIMEOUT
+        )
+    
+    formatted_results = track_table.normalize_many(results, thumbnails)
+    search_index.add(formatted_results)
+    return formatted_results
+
 @app.route('/api/search', methods=['GET'])
 def search():
-    """Search for tracks on YouTube Music"""
+    """Search for tracks on YouTube Music (?fields=id,name,... trims each track)"""
     query = request.args.get('q', '')
     if not query:
         return jsonify({'error': 'Query parameter required'}), 400
     
+    fields = parse_fields(request.args.get('fields'))
     try:
-        results = ytmusic.search(query, filter='songs', limit=20)
+        key = f'search:{normalize_query(query)}'
+        # Superseding is per explicit ?client= id only: callers sharing an IP
+        # (NAT, proxies) must not cancel each other's searches. Identical
+        # queries are coalesced by the response cache either way.
+        client_id = request.args.get('client')
         
-        formatted_results = []
-        for track in results:
-            video_id = track.get('videoId')
-            thumbnail_url = ''
+        cached = response_cache.peek(key, SEARCH_CACHE_TTL)
+        if cached is None:
+            # ?instant=1 never goes upstream: answer from recently seen tracks
+            if request.args.get('instant'):
+                return json_response({'tracks': {'items': project(search_index.search(query), fields)}, 'partial': True})
             
-            if video_id:
-                thumbnail_urls_to_try = [
-                    f'https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg',
-                    f'https://i.ytimg.com/vi/{video_id}/sddefault.jpg',
-                    f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'
-                ]
-                thumbnail_url = thumbnail_urls_to_try[0]
-            elif track.get('thumbnails'):
-                thumbnails = track['thumbnails']
-                if thumbnails:
-                    thumbnail_url = thumbnails[-1]['url']
-                    if '=w' in thumbnail_url or '=s' in thumbnail_url:
-                        thumbnail_url = thumbnail_url.split('=w')[0].split('=s')[0]
-            
-            formatted_track = {
-                'id': track.get('videoId'),
-                'name': track.get('title'),
-                'artists': [{'name': artist['name']} for artist in track.get('artists', [])],
-                'album': {
-                    'name': track.get('album', {}).get('name', 'Unknown Album') if track.get('album') else 'Unknown Album',
-                    'images': [
-                        {'url': thumbnail_url, 'height': 640, 'width': 640}
-                    ]
-                },
-                'duration_ms': track.get('duration_seconds', 0) * 1000 if track.get('duration_seconds') else 0,
-                'uri': f"ytmusic:{track.get('videoId')}",
-                'preview_url': None,
-                'external_urls': {
-                    'youtube': f"https://music.youtube.com/watch?v={track.get('videoId')}"
-                }
-            }
-            formatted_results.append(formatted_track)
+            if client_id:
+                # Wait out this client's previous search; if they typed more
+                # meanwhile, skip the upstream call for this stale prefix
+                state, ticket = client_searches.ticket(client_id)
+                try:
+                    acquired = client_searches.acquire(state, ticket)
+                except TimeoutError as e:
+                    return json_response({
+                        'error': str(e),
+                        'tracks': {'items': project(search_index.search(query), fields)},
+                        'partial': True,
+                        'timeout': True
+                    }, status=504)
+                if not acquired:
+                    return json_response({
+                        'tracks': {'items': project(search_index.search(query), fields)},
+                        'partial': True,
+                        'superseded': True
+                    })
+                try:
+                    formatted_results = response_cache.get_or_compute(
+                        key, SEARCH_CACHE_TTL, lambda: fetch_search_results(query)
+                    )
+                finally:
+                    client_searches.release(state)
+                return json_response({'tracks': {'items': project(formatted_results, fields)}})
         
-        return jsonify({'tracks': {'items': formatted_results}})
+        formatted_results = response_cache.get_or_compute(
+            key, SEARCH_CACHE_TTL, lambda: fetch_search_results(query)
+        )
+        return json_response({'tracks': {'items': project(formatted_results, fields)}})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -97,103 +406,274 @@ def search():
 def get_track(video_id):
     """Get track streaming URL using yt-dlp"""
     try:
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(f'https://music.youtube.com/watch?v={video_id}', download=False)
-            
-            audio_url = info.get('url')
-            
-            return jsonify({
-                'videoId': video_id,
-                'audioUrl': audio_url,
-                'title': info.get('title'),
-                'duration': info.get('duration')
-            })
+        return jsonify(track_info(video_id, stream_url_cache.get(video_id)))
     except Exception as e:
-        print(f"Error getting track: {str(e)}")
+        log.error("Error getting track: %s", e)
         return jsonify({'error': str(e)}), 500
 
+# Bounded pool for /api/tracks/resolve; a 50-track playlist resolves in about
+# the time of its slowest extraction instead of the sum of all of them
+track_resolver = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('TRACK_RESOLVE_WORKERS', 8)),
+    thread_name_prefix='resolve',
+    initializer=init_extractor,
+)
+
+def track_info(video_id, resolved):
+    return {
+        'videoId': video_id,
+        'audioUrl': resolved['url'],
+        'title': resolved['title'],
+        'duration': resolved['duration']
+    }
+
+@app.route('/api/tracks/resolve', methods=['GET', 'POST'])
+def resolve_tracks():
+    """Resolve many tracks at once: ?ids=a,b,c or {"video_ids": [...]}.
+    
+    Streams NDJSON, one line per track as soon as it resolves (or fails),
+    then a final done line with the counts.
+    """
+    if request.method == 'POST':
+        video_ids = (request.get_json(silent=True) or {}).get('video_ids', [])
+    else:
+        video_ids = [v for v in request.args.get('ids', '').split(',') if v]
+    
+    if not isinstance(video_ids, list) or not all(isinstance(v, str) for v in video_ids):
+        return jsonify({'error': 'video_ids must be a list of strings'}), 400
+    video_ids = list(dict.fromkeys(video_ids))
+    if not video_ids:
+        return jsonify({'error': 'video_ids required'}), 400
+    if len(video_ids) > 100:
+        return jsonify({'error': 'At most 100 video_ids per request'}), 400
+    
+    futures = {track_resolver.submit(stream_url_cache.get, v): v for v in video_ids}
+    return ndjson_response(resolved_track_lines(futures))
+
+def resolved_track_lines(futures):
+    failed = 0
+    try:
+        for future in as_completed(futures):
+            video_id = futures[future]
+            try:
+                line = {'type': 'track', **track_info(video_id, future.result())}
+            except Exception as e:
+                failed += 1
+                line = {'type': 'error', 'videoId': video_id, 'error': str(e)}
+            yield json.dumps(line, ensure_ascii=False) + '\n'
+        yield json.dumps({'type': 'done', 'resolved': len(futures) - failed, 'failed': failed}) + '\n'
+    finally:
+        # Client went away: don't extract tracks nobody will read
+        for future in futures:
+            future.cancel()
+
+def open_upstream_audio(video_id, range_header=None):
+    """GET the resolved audio URL, resolving again once if upstream rejects it"""
+    resolved = stream_url_cache.get(video_id)
+    
+    upstream_headers = {}
+    if range_header:
+        upstream_headers['Range'] = range_header
+    
+    with stage('upstream_first_byte'):
+        resp = audio_session.get(resolved['url'], headers=upstream_headers, stream=True, timeout=30)
+    
+    if resp.status_code in (403, 410):
+        # The signed URL died before its expire= time; resolve it again once
+        resp.close()
+        log.warning("Cached audio URL for %s rejected (%s), re-extracting...", video_id, resp.status_code)
+        stream_url_cache.invalidate(video_id)
+        resolved = stream_url_cache.get(video_id)
+        with stage('upstream_first_byte'):
+            resp = audio_session.get(resolved['url'], headers=upstream_headers, stream=True, timeout=30)
+    
+    return resolved, resp
+
+def upstream_chunks(resp, write=None):
+    """Proxy an upstream body, optionally copying it into the audio cache"""
+    # Read straight from urllib3: audio is never content-encoded, so
+    # skip iter_content's decode layer and its extra generator hops
+    try:
+        for chunk in resp.raw.stream(STREAM_CHUNK_SIZE, decode_content=False):
+            if write:
+                write(chunk)
+            yield chunk
+    finally:
+        resp.close()
+        if write:
+            write(None)
+
+def metered(chunks, mode='wsgi'):
+    """Count an audio response as active while it streams and tally its bytes"""
+    active_streams.inc(mode=mode)
+    try:
+        for chunk in chunks:
+            stream_bytes.inc(len(chunk), mode=mode)
+            yield chunk
+    finally:
+        active_streams.dec(mode=mode)
+
+def start_audio_cache(video_id, resolved, resp):
+    """Return a cache writer for this upstream response, if its size is known"""
+    if resp.status_code == 206:
+        content_range = parse_content_range(resp.headers.get('Content-Range'))
+        if not content_range:
+            return None
+        offset, _, total = content_range
+    elif resp.status_code == 200 and resp.headers.get('Content-Length'):
+        offset, total = 0, int(resp.headers['Content-Length'])
+    else:
+        return None
+    
+    entry = audio_cache.get(video_id)
+    if entry is None or entry.total != total or entry.format_id != resolved['format']['format_id']:
+        entry = audio_cache.create(
+            video_id, total,
+            resp.headers.get('Content-Type', resolved['content_type']),
+            resolved['format']['format_id']
+        )
+    return entry.writer(offset)
+
+def open_missing_piece(video_id, entry, piece_start, piece_end):
+    """Upstream response for a span the cache lacks, or None (and the entry
+    dropped) if upstream no longer serves the bytes that were cached"""
+    resolved, resp = open_upstream_audio(video_id, f'bytes={piece_start}-{piece_end - 1}')
+    content_range = parse_content_range(resp.headers.get('Content-Range'))
+    if (resp.status_code != 206 or not content_range or content_range[0] != piece_start
+            or content_range[2] != entry.total or resolved['format']['format_id'] != entry.format_id):
+        resp.close()
+        audio_cache.drop(video_id)
+        log.warning("Cached audio for %s no longer matches upstream, dropped it", video_id)
+        return None
+    return resp
+
+def serve_cached_audio(video_id, entry, start, end, partial, mode='wsgi'):
+    """Serve [start, end) from disk, fetching only the missing spans upstream.
+    
+    The first missing span is requested before the response starts; if
+    upstream changed, None is returned and the caller proxies instead. A
+    later span that no longer matches ends the body early, and the client's
+    next range request finds the entry gone.
+    """
+    pieces = entry.plan(start, end)
+    opened = {}
+    first_missing = next(((s, e) for cached, s, e in pieces if not cached), None)
+    if first_missing:
+        resp = open_missing_piece(video_id, entry, *first_missing)
+        if resp is None:
+            return None
+        opened[first_missing[0]] = resp
+    
+    def generate():
+        for cached, piece_start, piece_end in pieces:
+            if cached:
+                audio_cache.record(hit_bytes=piece_end - piece_start)
+                yield from entry.read(piece_start, piece_end, STREAM_CHUNK_SIZE)
+                continue
+            
+            audio_cache.record(miss_bytes=piece_end - piece_start)
+            resp = opened.pop(piece_start, None) or open_missing_piece(video_id, entry, piece_start, piece_end)
+            if resp is None:
+                return
+            yield from upstream_chunks(resp, entry.writer(piece_start))
+    
+    response_headers = {
+        'Content-Type': entry.content_type,
+        'Accept-Ranges': 'bytes',
+        'Content-Length': str(end - start),
+    }
+    if partial:
+        response_headers['Content-Range'] = f'bytes {start}-{end - 1}/{entry.total}'
+    
+    response = Response(metered(generate(), mode), status=206 if partial else 200, headers=response_headers)
+    # A client gone before the first missing span was reached leaves it open
+    response.call_on_close(lambda: [resp.close() for resp in opened.values()])
+    return response
+
+PREFETCH_BYTES = int(os.environ.get('PREFETCH_BYTES', 256 * 1024))
+
+def upcoming_tracks(video_id):
+    """Video ids likely to play after video_id (the cached recommendations)"""
+    tracks = response_cache.get_or_compute(
+        f'recommendations:{video_id}', RECOMMENDATIONS_CACHE_TTL, lambda: fetch_recommendations(video_id)
+    )
+    return [track['id'] for track in tracks]
+
+def warm_track(video_id):
+    """Resolve a track's stream URL and pull its first bytes into the audio cache"""
+    stream_url_cache.get(video_id)
+    if not audio_cache or PREFETCH_BYTES <= 0:
+        return
+    
+    entry = audio_cache.get(video_id)
+    if entry is not None and entry.covers(0, min(PREFETCH_BYTES, entry.total)):
+        return
+    
+    resolved, resp = open_upstream_audio(video_id, f'bytes=0-{PREFETCH_BYTES - 1}')
+    for _ in upstream_chunks(resp, start_audio_cache(video_id, resolved, resp)):
+        pass
+
+# Optional: when a track starts, get the next few ready in the background
+prefetcher = Prefetcher(
+    upcoming_tracks,
+    warm_track,
+    count=int(os.environ.get('PREFETCH_COUNT', 3)),
+    workers=int(os.environ.get('PREFETCH_WORKERS', 2)),
+    rate_per_minute=int(os.environ.get('PREFETCH_RATE_PER_MINUTE', 60)),
+) if os.environ.get('PREFETCH_ENABLED', '').lower() in ('1', 'true', 'yes', 'on') else None
+
+def audio_response(video_id, range_header=None, mode='wsgi'):
+    """The /api/stream response: from the audio cache where it has the range,
+    otherwise proxied from YouTube Music (and cached on the way through).
+    
+    Raises LookupError if the track has no audio URL. asgi.py sends the same
+    response from its event loop, with mode='asgi' in the stream metrics.
+    """
+    # A request from byte 0 means playback of this track is starting
+    if prefetcher and (not range_header or range_header.startswith('bytes=0-')):
+        prefetcher.claim(video_id)
+        prefetcher.on_play(video_id)
+    
+    entry = audio_cache.get(video_id) if audio_cache else None
+    if entry is not None:
+        span = parse_range(range_header, entry.total) if range_header else (0, entry.total)
+        response = serve_cached_audio(video_id, entry, span[0], span[1], bool(range_header), mode) if span else None
+        if response is not None:
+            return response
+    
+    resolved, resp = open_upstream_audio(video_id, range_header)
+    content_type = resp.headers.get('Content-Type', resolved['content_type'])
+    
+    response_headers = {
+        'Content-Type': content_type,
+        'Accept-Ranges': 'bytes',
+    }
+    
+    if range_header and resp.status_code == 206:
+        response_headers['Content-Range'] = resp.headers.get('Content-Range')
+        response_headers['Content-Length'] = resp.headers.get('Content-Length')
+        status_code = 206
+    else:
+        if 'Content-Length' in resp.headers:
+            response_headers['Content-Length'] = resp.headers.get('Content-Length')
+        status_code = 200
+    
+    write = None
+    if audio_cache:
+        write = start_audio_cache(video_id, resolved, resp)
+        audio_cache.record(miss_bytes=int(resp.headers.get('Content-Length') or 0))
+    
+    return Response(metered(upstream_chunks(resp, write), mode), status=status_code, headers=response_headers)
+
 @app.route('/api/stream/<video_id>', methods=['GET'])
 def stream_track(video_id):
-    """Stream audio directly from YouTube Music - URL is fetched fresh on each request"""
+    """Stream audio from the local cache, or from YouTube Music using the cached resolved URL"""
     try:
-        ydl_opts = {
-            'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best',
-            'quiet': False,
-            'no_warnings': False,
-            'extract_flat': False,
-            'nocheckcertificate': False,
-            'prefer_insecure': False,
-            'legacy_server_connect': True,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            print(f"Extracting info for video {video_id}...")
-            info = ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
-            
-            audio_url = info.get('url')
-            
-            if not audio_url:
-                if info.get('requested_formats'):
-                    for fmt in info['requested_formats']:
-                        if fmt.get('acodec') != 'none':
-                            audio_url = fmt.get('url')
-                            break
-                elif info.get('formats'):
-                    for fmt in info['formats']:
-                        if fmt.get('acodec') != 'none' and fmt.get('url'):
-                            audio_url = fmt.get('url')
-                            break
-            
-            if not audio_url:
-                return jsonify({'error': 'No audio URL found'}), 404
-            
-            range_header = request.headers.get('Range', None)
-            
-            print(f"Streaming video {video_id}, audio URL: {audio_url[:100]}...")
-            
-            upstream_headers = {}
-            if range_header:
-                upstream_headers['Range'] = range_header
-            
-            resp = requests.get(audio_url, headers=upstream_headers, stream=True, timeout=30)
-            
-            content_type = resp.headers.get('Content-Type', 'audio/webm')
-            
-            response_headers = {
-                'Content-Type': content_type,
-                'Accept-Ranges': 'bytes',
-            }
-            
-            if range_header and resp.status_code == 206:
-                response_headers['Content-Range'] = resp.headers.get('Content-Range')
-                response_headers['Content-Length'] = resp.headers.get('Content-Length')
-                status_code = 206
-            else:
-                if 'Content-Length' in resp.headers:
-                    response_headers['Content-Length'] = resp.headers.get('Content-Length')
-                status_code = 200
-            
-            def generate():
-                try:
-                    for chunk in resp.iter_content(chunk_size=8192):
-                        if chunk:
-                            yield chunk
-                finally:
-                    resp.close()
-            
-            return Response(generate(), status=status_code, headers=response_headers)
-            
+        return audio_response(video_id, request.headers.get('Range', None))
+    except LookupError:
+        return jsonify({'error': 'No audio URL found'}), 404
     except Exception as e:
-        print(f"Error streaming track: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error streaming track: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/playlist/create', methods=['POST'])
@@ -220,190 +700,379 @@ def create_playlist():
 def get_thumbnail(video_id):
     """Get valid thumbnail URL for a video"""
     try:
-        qualities = ['maxresdefault', 'sddefault', 'hqdefault', 'mqdefault', 'default']
-        for quality in qualities:
-            thumbnail_url = f'https://i.ytimg.com/vi/{video_id}/{quality}.jpg'
-            resp = requests.head(thumbnail_url, timeout=5)
-            if resp.status_code == 200:
-                return jsonify({'thumbnail_url': thumbnail_url})
-        
-        return jsonify({'thumbnail_url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'})
+        return jsonify({'thumbnail_url': thumbnail_resolver.resolve(video_id)})
+    except Exception as e:
+        log.error("Error getting thumbnail: %s", e)
+        return jsonify({'thumbnail_url': thumbnail_url(video_id)})
+
+@app.route('/api/thumbnails', methods=['GET', 'POST'])
+def get_thumbnails():
+    """Resolve thumbnails for a whole page: ?ids=a,b,c or {"video_ids": [...]}"""
+    if request.method == 'POST':
+        video_ids = (request.get_json(silent=True) or {}).get('video_ids', [])
+    else:
+        video_ids = [v for v in request.args.get('ids', '').split(',') if v]
+    
+    if not isinstance(video_ids, list):
+        return jsonify({'error': 'video_ids must be a list of strings'}), 400
+    if not video_ids:
+        return jsonify({'error': 'video_ids required'}), 400
+    if len(video_ids) > 100:
+        return jsonify({'error': 'At most 100 video_ids per request'}), 400
+    invalid = [v for v in video_ids if not valid_video_id(v)]
+    if invalid:
+        return jsonify({'error': 'Invalid video ids', 'invalid': invalid}), 400
+    
+    try:
+        return jsonify({'thumbnails': thumbnail_resolver.resolve_many(video_ids)})
     except Exception as e:
-        print(f"Error getting thumbnail: {str(e)}")
-        return jsonify({'thumbnail_url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'})
+        log.error("Error getting thumbnails: %s", e)
+        return jsonify({'thumbnails': {v: thumbnail_url(v) for v in video_ids}})
+
+@app.route('/api/spotify/tracks', methods=['GET', 'POST'])
+def get_spotify_tracks():
+    """Spotify metadata for many tracks: ?ids=a,b,c or {"track_ids": [...]}"""
+    if request.method == 'POST':
+        track_ids = (request.get_json(silent=True) or {}).get('track_ids', [])
+    else:
+        track_ids = [t for t in request.args.get('ids', '').split(',') if t]
+    
+    if not track_ids or not isinstance(track_ids, list):
+        return jsonify({'error': 'track_ids required'}), 400
+    if len(track_ids) > 100:
+        return jsonify({'error': 'At most 100 track_ids per request'}), 400
+    invalid = [t for t in track_ids if not valid_track_id(t)]
+    if invalid:
+        return jsonify({'error': 'Invalid Spotify track ids', 'invalid': invalid}), 400
+    
+    try:
+        return jsonify({'tracks': spotify_tracks.get_many(track_ids)})
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        log.error("Error getting Spotify tracks: %s", e)
+        return jsonify({'error': str(e)}), 502
 
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'service': 'ytmusic-backend'})
+    return jsonify({
+        'status': 'ok',
+        'service': 'ytmusic-backend',
+        'whisper_model': 'loaded' if whisper_model is not None else ('loading' if whisper_model_lock.locked() else 'not loaded')
+    })
+
+def component_stats():
+    return {
+        'stream_urls': stream_url_cache.stats(),
+        'responses': response_cache.stats(),
+        'audio': audio_cache.stats() if audio_cache else None,
+        'prefetch': prefetcher.stats() if prefetcher else None,
+        'thumbnails': thumbnail_resolver.stats(),
+        'lyrics': lyrics_store.stats(),
+        'share_pages': share_page_cache.stats(),
+        'shares': share_store.stats(),
+        'spotify_tracks': spotify_tracks.stats(),
+        'spotify_token': spotify_token.stats(),
+        'tracks': track_table.stats(),
+        'search_index': {
+            'tracks': len(search_index),
+            'superseded': client_searches.superseded,
+            'timeouts': client_searches.timeouts,
+        },
+        'transcription': transcription_queue.stats(),
+        'parallel_transcription': parallel_transcriber.stats() if parallel_transcriber else None,
+        'startup': startup,
+    }
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the in-process caches"""
+    return jsonify(component_stats())
+
+@registry.collector
+def collect_component_stats():
+    """Every numeric value from /api/cache/stats as a labelled gauge"""
+    gauge = Gauge('nova_component_stat', 'Cache, queue and store counters (see /api/cache/stats)', ('component', 'stat'))
+    for component, stats in component_stats().items():
+        for stat, value in (stats or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauge.set(value, component=component, stat=stat)
+    return [gauge]
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of request, stage and cache metrics"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+def fetch_recommendations(video_id):
+    """Format the watch playlist (related songs) for a video like Spotify tracks"""
+    # Get the watch playlist (related songs) from YouTube Music
+    with stage('ytmusic_watch_playlist'):
+        watch_playlist = get_ytmusic().get_watch_playlist(videoId=video_id, limit=20)
+    
+    if not watch_playlist or 'tracks' not in watch_playlist:
+        return []
+    
+    # Skip the current song
+    tracks = [t for t in watch_playlist['tracks'] if t.get('videoId') and t['videoId'] != video_id]
+    
+    with stage('thumbnails'):
+        thumbnails = thumbnail_resolver.resolve_many(
+            [track['videoId'] for track in tracks], timeout=THUMBNAIL_PAGE_TIMEOUT
+        )
+    
+    formatted_results = track_table.normalize_many(tracks, thumbnails)
+    search_index.add(formatted_results)
+    return formatted_results
 
 @app.route('/api/recommendations/<video_id>', methods=['GET'])
 def get_recommendations(video_id):
-    """Get song recommendations based on a video ID"""
+    """Get song recommendations based on a video ID (?fields= as for search)"""
+    fields = parse_fields(request.args.get('fields'))
     try:
-        # Get the watch playlist (related songs) from YouTube Music
-        watch_playlist = ytmusic.get_watch_playlist(videoId=video_id, limit=20)
-        
-        if not watch_playlist or 'tracks' not in watch_playlist:
-            return jsonify({'tracks': []})
-        
-        tracks = watch_playlist['tracks']
-        formatted_results = []
-        
-        for track in tracks:
-            track_video_id = track.get('videoId')
-            if not track_video_id or track_video_id == video_id:
-                continue  # Skip the current song
-                
-            thumbnail_url = ''
-            if track_video_id:
-                thumbnail_url = f'https://i.ytimg.com/vi/{track_video_id}/maxresdefault.jpg'
-            elif track.get('thumbnail'):
-                thumbnails = track['thumbnail']
-                if thumbnails:
-                    thumbnail_url = thumbnails[-1]['url']
-                    if '=w' in thumbnail_url or '=s' in thumbnail_url:
-                        thumbnail_url = thumbnail_url.split('=w')[0].split('=s')[0]
-            
-            formatted_track = {
-                'id': track_video_id,
-                'name': track.get('title'),
-                'artists': [{'name': artist['name']} for artist in track.get('artists', [])],
-                'album': {
-                    'name': track.get('album', {}).get('name', 'Unknown Album') if track.get('album') else 'Unknown Album',
-                    'images': [
-                        {'url': thumbnail_url, 'height': 640, 'width': 640}
-                    ]
-                },
-                'duration_ms': track.get('duration_seconds', 0) * 1000 if track.get('duration_seconds') else 0,
-                'uri': f"ytmusic:{track_video_id}",
-                'preview_url': None,
-                'external_urls': {
-                    'youtube': f"https://music.youtube.com/watch?v={track_video_id}"
-                }
-            }
-            formatted_results.append(formatted_track)
-        
-        return jsonify({'tracks': formatted_results})
+        formatted_results = response_cache.get_or_compute(
+            f'recommendations:{video_id}', RECOMMENDATIONS_CACHE_TTL, lambda: fetch_recommendations(video_id)
+        )
+        return json_response({'tracks': project(formatted_results, fields)})
     except Exception as e:
-        print(f"Error getting recommendations: {e}")
+        log.error("Error getting recommendations: %s", e)
         return jsonify({'error': str(e), 'tracks': []}), 500
 
 @app.route('/api/lyrics/<video_id>', methods=['GET'])
 def get_lyrics(video_id):
     try:
         # Check cache first
-        cache_file = LYRICS_CACHE_DIR / f"{video_id}.json"
-        if cache_file.exists():
-            print(f"✓ Found cached lyrics for {video_id}")
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cached_data = json.load(f)
-                return jsonify(cached_data)
+        cached_data = lyrics_store.get(video_id)
+        if cached_data is not None:
+            log.debug("✓ Found cached lyrics for %s", video_id)
+            return jsonify(cached_data)
         
         # Always use Whisper AI for karaoke-style synced lyrics!
-        print(f"🎤 No cache found, starting Whisper AI transcription for {video_id}...")
         result_data = {
             'lyrics': 'Transcribing lyrics with AI... This may take 15-30 seconds.',
             'source': 'transcribing',
             'synced': False,
             'segments': []
         }
+        
+        job = transcription_queue.find(video_id)
+        if job:
+            result_data['job_id'] = job['job_id']
+            result_data['status'] = job['status']
+        else:
+            log.info("🎤 No cache found, starting Whisper AI transcription for %s...", video_id)
         return jsonify(result_data)
             
     except Exception as e:
-        print(f"Error getting lyrics: {str(e)}")
+        log.error("Error getting lyrics: %s", e)
         return jsonify({'error': str(e), 'lyrics': 'Lyrics not available'}), 500
 
-@app.route('/api/lyrics/<video_id>/transcribe', methods=['POST'])
-def transcribe_lyrics(video_id):
-    """Transcribe lyrics using Whisper AI"""
-    try:
-        # Check cache first
-        cache_file = LYRICS_CACHE_DIR / f"{video_id}.json"
-        if cache_file.exists():
-            print(f"✓ Found cached transcription for {video_id}")
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cached_data = json.load(f)
-                if cached_data.get('source') == 'whisper_ai':
-                    return jsonify(cached_data)
-        
-        print(f"🎤 Starting Whisper transcription for {video_id}...")
-        
-        # Download audio file
-        audio_file = LYRICS_CACHE_DIR / f"{video_id}.mp3"
-        
-        if not audio_file.exists():
-            print("📥 Downloading audio...")
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': str(audio_file.with_suffix('')),
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'quiet': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([f'https://music.youtube.com/watch?v={video_id}'])
-        
-        # Transcribe with Whisper
-        print("🎵 Transcribing with Whisper AI...")
-        model = get_whisper_model()
+WHISPER_SAMPLE_RATE = 16000
+
+def write_cached_lyrics(video_id, result_data):
+    """Store a transcription where get_lyrics looks for it"""
+    lyrics_store.put(video_id, result_data)
+
+def decode_audio_url(resolved, sample_rate=WHISPER_SAMPLE_RATE):
+    """Pipe an audio URL through ffmpeg into mono float32 PCM.
+    
+    ffmpeg reads the native m4a/webm while it downloads, so fetching and
+    decoding overlap and nothing is re-encoded or written to disk.
+    """
+    import numpy as np
+    
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-reconnect', '1']
+    headers = ''.join(f'{k}: {v}\r\n' for k, v in resolved.get('http_headers', {}).items())
+    if headers:
+        cmd += ['-headers', headers]
+    cmd += ['-i', resolved['url'], '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1']
+    
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()[-300:]}")
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+def load_whisper_audio(video_id):
+    """Return (audio, temp_file) ready for WhisperModel.transcribe.
+    
+    audio is 16 kHz float PCM when ffmpeg is available. Without it we fall
+    back to downloading the native bestaudio file (no MP3 conversion) and
+    let faster-whisper decode it; temp_file is then the path to delete.
+    """
+    if shutil.which('ffmpeg'):
+        try:
+            return decode_audio_url(stream_url_cache.get(video_id)), None
+        except RuntimeError as e:
+            # Most likely a signed URL that expired early; resolve once more
+            log.warning("Decoding cached URL for %s failed (%s), re-extracting...", video_id, e)
+            stream_url_cache.invalidate(video_id)
+            return decode_audio_url(stream_url_cache.get(video_id)), None
+    
+    log.warning("ffmpeg not found, downloading native audio for Whisper to decode...")
+    ydl_opts = {
+        'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best',
+        'outtmpl': str(LYRICS_CACHE_DIR / f'{video_id}.%(ext)s'),
+        'quiet': True,
+    }
+    import yt_dlp
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(f'https://music.youtube.com/watch?v={video_id}', download=True)
+        audio_file = Path(ydl.prepare_filename(info))
+    return str(audio_file), audio_file
+
+def run_transcription(video_id, on_segment=None):
+    """Download audio, transcribe it with Whisper and cache the result.
+    
+    on_segment is called with each {start, text} segment as soon as Whisper
+    decodes it; the cache file is only written once the song is finished.
+    """
+    log.info("🎤 Starting Whisper transcription for %s...", video_id)
+    
+    # Transcribe with Whisper
+    model = get_whisper_model()
+    
+    if model is None:
+        raise RuntimeError('Whisper model not available')
+    
+    log.debug("📥 Decoding audio...")
+    with stage('whisper_load_audio'):
+        audio, audio_file = load_whisper_audio(video_id)
+    
+    log.debug("🎵 Transcribing with Whisper AI...")
+    started = time.perf_counter()
+    lyrics_segments = None
+    # Segments already streamed to on_segment before a parallel run failed
+    streamed = []
+    if parallel_transcriber is not None and parallel_transcriber.should_split(audio):
+        # Detect the language once from the opening 30 s and pin it for every chunk
+        _, info = model.transcribe(audio[:WHISPER_SAMPLE_RATE * 30], **whisper_profile.transcribe_options())
+        log.info("🌍 Detected language: %s", info.language)
         
-        if model is None:
-            return jsonify({
-                'error': 'Whisper model not available',
-                'lyrics': 'AI transcription unavailable'
-            }), 500
+        def on_parallel_segment(lyrics_segment):
+            streamed.append(lyrics_segment)
+            if on_segment:
+                on_segment(lyrics_segment)
         
+        try:
+            with stage('whisper_transcribe'):
+                lyrics_segments = parallel_transcriber.transcribe(audio, info.language, on_parallel_segment)
+            duration = len(audio) / WHISPER_SAMPLE_RATE
+        except BrokenProcessPool:
+            log.warning("Whisper pool worker died, transcribing %s sequentially", video_id)
+    if lyrics_segments is None:
         # Auto-detect language (supports 99 languages!)
-        segments_list, info = model.transcribe(str(audio_file), word_timestamps=False)
-        detected_language = info.language
-        print(f"🌍 Detected language: {detected_language}")
+        segments_list, info = model.transcribe(audio, word_timestamps=False, **whisper_profile.transcribe_options())
+        log.info("🌍 Detected language: %s", info.language)
         
         lyrics_segments = []
-        lyrics_lines = []
-        
-        for segment in segments_list:
-            text = segment.text.strip()
-            if text:
-                lyrics_lines.append(text)
-                lyrics_segments.append({
-                    'start': segment.start,
-                    'text': text
-                })
-        
-        lyrics_text = '\n'.join(lyrics_lines)
+        resume_after = streamed[-1]['start'] if streamed else None
+        # Segments decode lazily, so the loop is where Whisper does its work
+        with stage('whisper_transcribe'):
+            for lyrics_segment in lyrics_lines(segments_list):
+                lyrics_segments.append(lyrics_segment)
+                # Listeners already have the lines up to resume_after
+                if on_segment and (resume_after is None or lyrics_segment['start'] > resume_after):
+                    on_segment(lyrics_segment)
+        duration = info.duration
+    if duration:
+        transcription_rtf.observe((time.perf_counter() - started) / duration)
+    
+    lyrics_text = '\n'.join(segment['text'] for segment in lyrics_segments)
+    
+    # Cache the result
+    result_data = {
+        'lyrics': lyrics_text,
+        'source': 'whisper_ai',
+        'synced': True,
+        'segments': lyrics_segments
+    }
+    write_cached_lyrics(video_id, result_data)
+    
+    # Clean up audio file to save storage - we only need the JSON!
+    if audio_file:
+        audio_file.unlink(missing_ok=True)
+        log.debug("✓ Audio file deleted, lyrics cached")
+    
+    log.info("✓ Transcription complete! %s segments", len(lyrics_segments))
+    return result_data
+
+# Whisper jobs run off the request thread; workers share the single model
+transcription_queue = TranscriptionQueue(
+    run_transcription,
+    max_workers=int(os.environ.get('WHISPER_WORKERS', 1)),
+)
+
+@app.route('/api/lyrics/<video_id>/transcribe', methods=['POST'])
+def transcribe_lyrics(video_id):
+    """Queue a Whisper transcription and return its job id right away.
+    
+    ?stream=1 instead streams the segments back as NDJSON while they decode.
+    """
+    try:
+        # Check cache first
+        cached_data = lyrics_store.get(video_id)
+        if cached_data is not None and cached_data.get('source') == 'whisper_ai':
+            log.debug("✓ Found cached transcription for %s", video_id)
+            if request.args.get('stream'):
+                return ndjson_response(cached_transcription_lines(cached_data))
+            return jsonify(cached_data)
         
-        # Cache the result
-        result_data = {
-            'lyrics': lyrics_text,
-            'source': 'whisper_ai',
-            'synced': True,
-            'segments': lyrics_segments
-        }
+        job = transcription_queue.submit(video_id)
         
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
+        if request.args.get('stream'):
+            return ndjson_response(stream_transcription(job['job_id']))
         
-        # Clean up audio file to save storage - we only need the JSON!
-        audio_file.unlink(missing_ok=True)
-        print(f"✓ Audio file deleted, lyrics cached")
+        # ?wait=1 keeps the old blocking behaviour for scripts
+        if request.args.get('wait'):
+            job = transcription_queue.wait(job['job_id'])
+            if job['status'] == 'error':
+                return jsonify({
+                    'error': job['error'],
+                    'lyrics': 'Transcription failed'
+                }), 500
+            return jsonify(job['result'])
         
-        print(f"✓ Transcription complete! {len(lyrics_segments)} segments")
-        return jsonify(result_data)
+        return jsonify(job), 202
         
     except Exception as e:
-        print(f"Error transcribing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error transcribing: %s", e)
         return jsonify({
             'error': str(e),
             'lyrics': 'Transcription failed'
         }), 500
 
+def ndjson_response(lines):
+    return Response(
+        lines,
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def cached_transcription_lines(cached_data):
+    for segment in cached_data.get('segments', []):
+        yield json.dumps({'type': 'segment', **segment}, ensure_ascii=False) + '\n'
+    yield json.dumps({'type': 'done', **cached_data}, ensure_ascii=False) + '\n'
+
+def stream_transcription(job_id):
+    """NDJSON lines: one per decoded segment, then a final done/error line"""
+    for item in transcription_queue.follow(job_id):
+        if 'job_id' not in item:
+            line = {'type': 'segment', 'start': item['start'], 'text': item['text']}
+        elif item['status'] == 'done':
+            line = {'type': 'done', **item['result']}
+        else:
+            line = {'type': 'error', 'error': item['error'], 'lyrics': 'Transcription failed'}
+        yield json.dumps(line, ensure_ascii=False) + '\n'
+
+@app.route('/api/lyrics/jobs/<job_id>', methods=['GET'])
+def get_transcription_job(job_id):
+    """Poll a transcription job; finished jobs include the lyrics as 'result'"""
+    job = transcription_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @app.route('/api/track-info/<track_id>')
 def get_track_info(track_id):
     """Get basic track info for sharing (doesn't require auth)"""
@@ -420,14 +1089,49 @@ def get_track_info(track_id):
 @app.route('/api/set-token', methods=['POST'])
 def set_token():
     """Store Spotify token for server-side operations like share links"""
-    global spotify_token_cache
-    data = request.json
+    data = request.get_json(silent=True) or {}
     token = data.get('token')
     if token:
-        spotify_token_cache = token
+        # Spotify access tokens last an hour unless the client says otherwise
+        try:
+            expires_in = int(data.get('expires_in') or 3600)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'expires_in must be a number of seconds'}), 400
+        spotify_token.set(token, expires_in)
         return jsonify({'success': True})
     return jsonify({'error': 'No token provided'}), 400
 
+# Shared playlists: sharded JSON files (default) or one SQLite table, with
+# decoded playlists kept in memory
+share_store = ShareStore(
+    make_share_backend(
+        os.environ.get('SHARE_STORE_BACKEND', 'file'),
+        os.environ.get('SHARE_STORE_PATH', Path(__file__).parent / 'playlist_shares'),
+    ),
+    cache_size=int(os.environ.get('SHARE_STORE_CACHE_SIZE', 1024)),
+)
+# Largest ?limit= accepted by /api/playlist/<share_id>
+SHARE_PAGE_LIMIT = 500
+
+# Share page templates are compiled once; rendered pages are cached per
+# share id and revalidated with ETag/Last-Modified
+SHARE_TEMPLATE = Template.load(Path(__file__).parent / 'share_template.html')
+PLAYLIST_SHARE_TEMPLATE = Template.load(Path(__file__).parent / 'playlist_share_template.html')
+SHARE_PAGE_MAX_AGE = int(os.environ.get('SHARE_PAGE_MAX_AGE', 300))
+share_page_cache = PageCache(
+    max_size=int(os.environ.get('SHARE_PAGE_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('SHARE_PAGE_CACHE_TTL', 3600)),
+)
+
+def share_page_response(page):
+    """200 with validators, or 304 when the client already has this page"""
+    resp = Response(page['body'], mimetype='text/html')
+    resp.set_etag(page['etag'])
+    resp.last_modified = page['last_modified']
+    resp.cache_control.public = True
+    resp.cache_control.max_age = SHARE_PAGE_MAX_AGE
+    return resp.make_conditional(request)
+
 @app.route('/api/create-playlist-share', methods=['POST'])
 def create_playlist_share():
     """Create a shareable playlist link"""
@@ -438,17 +1142,11 @@ def create_playlist_share():
         # Generate a unique share ID
         share_id = hashlib.md5(f"{playlist_id}{data.get('createdAt')}".encode()).hexdigest()[:12]
         
-        # Store playlist data in a JSON file (in production, use a database)
-        share_dir = Path(__file__).parent / 'playlist_shares'
-        share_dir.mkdir(exist_ok=True)
-        
-        share_file = share_dir / f'{share_id}.json'
-        with open(share_file, 'w') as f:
-            json.dump(data, f)
+        share_store.put(share_id, data)
         
         return jsonify({'shareId': share_id})
     except Exception as e:
-        print(f"Error creating playlist share: {e}")
+        log.error("Error creating playlist share: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/playlist/<share_id>')
@@ -456,18 +1154,18 @@ def share_playlist(share_id):
     """Generate share page for playlist"""
     try:
         # Load playlist data
-        share_file = Path(__file__).parent / 'playlist_shares' / f'{share_id}.json'
-        
-        if not share_file.exists():
+        share = share_store.get(share_id)
+        if share is None:
             return "Playlist not found", 404
         
-        with open(share_file, 'r') as f:
-            playlist = json.load(f)
+        # Re-sharing rewrites the share, which changes the version
+        version = share['version']
+        cache_key = ('playlist', share_id, request.url_root)
+        page = share_page_cache.get(cache_key, version)
+        if page is not None:
+            return share_page_response(page)
         
-        # Read the HTML template
-        template_path = Path(__file__).parent / 'playlist_share_template.html'
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template = f.read()
+        playlist = share['playlist']
         
         # Prepare data
         playlist_name = playlist.get('name', 'Untitled Playlist')
@@ -486,41 +1184,42 @@ def share_playlist(share_id):
         frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
         app_url = f'{frontend_url}?playlist={share_id}'
         
-        # Replace template variables
-        html = template.replace('{{playlist_name}}', playlist_name)
-        html = html.replace('{{playlist_description}}', playlist_desc or 'No description')
-        html = html.replace('{{track_count}}', str(track_count))
-        html = html.replace('{{share_url}}', share_url)
-        html = html.replace('{{app_url}}', app_url)
-        html = html.replace('{{share_id}}', share_id)
-        
-        # Replace covers
+        values = {
+            'playlist_name': playlist_name,
+            'playlist_description': playlist_desc or 'No description',
+            'track_count': track_count,
+            'share_url': share_url,
+            'app_url': app_url,
+            'share_id': share_id,
+            'tracks_json': json.dumps(tracks),
+        }
         for i in range(4):
-            cover_url = covers[i] if i < len(covers) else ''
-            html = html.replace(f'{{{{cover_{i+1}}}}}', cover_url)
+            values[f'cover_{i+1}'] = covers[i] if i < len(covers) else ''
         
-        # Build tracks JSON for the page
-        tracks_json = json.dumps(tracks)
-        html = html.replace('{{tracks_json}}', tracks_json)
-        
-        return html
+        html = PLAYLIST_SHARE_TEMPLATE.render(values)
+        page = share_page_cache.put(cache_key, html, last_modified=version / 1e9, version=version)
+        return share_page_response(page)
         
     except Exception as e:
-        print(f"Error generating playlist share page: {e}")
+        log.error("Error generating playlist share page: %s", e)
         return "Error loading playlist", 500
 
 @app.route('/api/playlist/<share_id>')
 def get_playlist_data(share_id):
-    """API endpoint to get playlist data"""
+    """API endpoint to get playlist data
+    
+    ?offset=&limit= return one page of tracks plus total_tracks/next_offset.
+    """
     try:
-        share_file = Path(__file__).parent / 'playlist_shares' / f'{share_id}.json'
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, SHARE_PAGE_LIMIT))
+        playlist = share_store.page(share_id, offset, limit)
         
-        if not share_file.exists():
+        if playlist is None:
             return jsonify({'error': 'Playlist not found'}), 404
         
-        with open(share_file, 'r') as f:
-            playlist = json.load(f)
-        
         return jsonify(playlist)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -528,68 +1227,72 @@ def get_playlist_data(share_id):
 @app.route('/share/<track_id>')
 def share_track(track_id):
     """Generate share page with rich embeds for Discord/Twitter/etc"""
+    if not valid_track_id(track_id):
+        # Not a Spotify id (e.g. a YouTube one): nothing to look up
+        return redirect(f'/?track={track_id}')
     try:
-        # Get Spotify token from cache or environment
-        spotify_token = spotify_token_cache or os.environ.get('SPOTIFY_TOKEN')
+        # Crawler bursts for a viral link are served without calling Spotify
+        cache_key = ('track', track_id, request.url_root)
+        page = share_page_cache.get(cache_key)
+        if page is not None:
+            return share_page_response(page)
         
-        if not spotify_token:
-            # Try to get track info from YTMusic as fallback
+        # Fetch track details from Spotify (cached, including unknown ids)
+        try:
+            with stage('spotify_track'):
+                track = spotify_tracks.get(track_id)
+        except LookupError:
+            # No Spotify token yet
             return redirect(f'/?track={track_id}')
         
-        # Fetch track details from Spotify
-        headers = {'Authorization': f'Bearer {spotify_token}'}
-        response = requests.get(
-            f'https://api.spotify.com/v1/tracks/{track_id}',
-            headers=headers
-        )
-        
-        if response.status_code != 200:
+        if track is None:
             return redirect(f'/?track={track_id}')
         
-        track = response.json()
-        
-        # Read the HTML template
-        template_path = Path(__file__).parent / 'share_template.html'
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template = f.read()
-        
-        # Prepare data for template
-        track_name = track.get('name', 'Unknown Track')
-        artist_name = ', '.join([artist['name'] for artist in track.get('artists', [])])
-        album_name = track.get('album', {}).get('name', 'Unknown Album')
-        album_image = track.get('album', {}).get('images', [{}])[0].get('url', '')
-        preview_url = track.get('preview_url', '')
-        duration = track.get('duration_ms', 0) // 1000
-        spotify_url = track.get('external_urls', {}).get('spotify', f'https://open.spotify.com/track/{track_id}')
-        share_url = f'{request.url_root}share/{track_id}'
-        app_url = f'{request.url_root}?track={track_id}'
-        
-        # Simple template replacement (you could use Jinja2 for more complex cases)
-        html = template.replace('{{track_name}}', track_name)
-        html = html.replace('{{artist_name}}', artist_name)
-        html = html.replace('{{album_name}}', album_name)
-        html = html.replace('{{album_image}}', album_image)
-        html = html.replace('{{duration}}', str(duration))
-        html = html.replace('{{spotify_url}}', spotify_url)
-        html = html.replace('{{share_url}}', share_url)
-        html = html.replace('{{app_url}}', app_url)
-        
-        # Handle preview URL (conditional rendering)
-        if preview_url:
-            html = html.replace('{{#preview_url}}', '')
-            html = html.replace('{{/preview_url}}', '')
-            html = html.replace('{{preview_url}}', preview_url)
-        else:
-            # Remove the audio section if no preview
-            import re
-            html = re.sub(r'{{#preview_url}}.*?{{/preview_url}}', '', html, flags=re.DOTALL)
-        
-        return html
+        html = SHARE_TEMPLATE.render({
+            'track_name': track.get('name', 'Unknown Track'),
+            'artist_name': ', '.join([artist['name'] for artist in track.get('artists', [])]),
+            'album_name': track.get('album', {}).get('name', 'Unknown Album'),
+            'album_image': track.get('album', {}).get('images', [{}])[0].get('url', ''),
+            'preview_url': track.get('preview_url') or '',
+            'duration': track.get('duration_ms', 0) // 1000,
+            'spotify_url': track.get('external_urls', {}).get('spotify', f'https://open.spotify.com/track/{track_id}'),
+            'share_url': f'{request.url_root}share/{track_id}',
+            'app_url': f'{request.url_root}?track={track_id}',
+        })
+        return share_page_response(share_page_cache.put(cache_key, html))
         
     except Exception as e:
-        print(f"Error generating share page: {e}")
+        log.error("Error generating share page: %s", e)
         return redirect(f'/?track={track_id}')
 
+startup = {'warmed': False, 'warmup_seconds': None}
+
+def warm_clients():
+    """Import yt-dlp/ytmusicapi/requests and build their clients off the request path"""
+    started = time.perf_counter()
+    try:
+        get_ytmusic()
+        import yt_dlp
+        yt_dlp.YoutubeDL(AUDIO_YDL_OPTS)
+        for session in (audio_session, thumbnail_session, spotify_session):
+            session.get_session()
+    except Exception as e:
+        log.warning("Warming upstream clients failed: %s", e)
+        return
+    startup['warmed'] = True
+    startup['warmup_seconds'] = round(time.perf_counter() - started, 3)
+    log.info("✓ Upstream clients ready in %.2fs", startup['warmup_seconds'])
+
+# Warm the clients shortly after startup, once the server is listening; a
+# negative WARMUP_DELAY leaves them to the first request that needs them
+WARMUP_DELAY = float(os.environ.get('WARMUP_DELAY', 1))
+if WARMUP_DELAY >= 0:
+    warmup_timer = threading.Timer(WARMUP_DELAY, warm_clients)
+    warmup_timer.daemon = True
+    warmup_timer.start()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    # The debug reloader imports everything twice; FLASK_DEBUG=0 skips it
+    debug = os.environ.get('FLASK_DEBUG', '1').lower() in ('1', 'true', 'yes', 'on')
+    app.run(debug=debug, host='0.0.0.0', port=port)
@@ -0,0 +1,230 @@
+"""Async serving mode: the audio proxy runs on an event loop.
+
+    pip install uvicorn asgiref
+    uvicorn asgi:app --host 0.0.0.0 --port 5001
+
+/api/stream/<video_id> and /api/track/<video_id> are answered here with the
+same helpers the Flask routes use (app.audio_response, app.track_info), so
+the audio cache, prefetching and re-resolving expired URLs behave the same in
+both modes. What differs is who waits: each blocking step (resolving, opening
+the upstream request, reading one chunk) runs on a thread from a shared pool
+(ASGI_STREAM_THREADS), and waiting for a slow client happens on the loop, so
+thousands of long-lived listeners share a few threads instead of holding one
+each. The next chunk is only read once the previous one was sent, and a
+disconnect closes the upstream request after the chunk being read. Every
+other route is passed through to the Flask app unchanged, each on its own
+worker thread (ASGI_WSGI_THREADS).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from tempfile import SpooledTemporaryFile
+
+from asgiref.wsgi import WsgiToAsgiInstance
+
+import app as flask_app
+
+log = logging.getLogger(__name__)
+
+STREAM_ROUTE = re.compile(r'^/api/stream/([\w-]+)$')
+TRACK_ROUTE = re.compile(r'^/api/track/([\w-]+)$')
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """One request to the Flask app, run on a thread from a shared pool.
+
+    asgiref's WsgiToAsgi runs every request through a thread-sensitive
+    sync_to_async, i.e. on one shared thread, so a slow search or a streamed
+    transcription held up every other pass-through route. Only the environ
+    and start_response handling is reused from it here.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+        self.disconnected = threading.Event()
+
+    async def __call__(self, scope, receive, send):
+        self.scope = scope
+        loop = asyncio.get_running_loop()
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            self.sync_send = lambda message: asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            async def wait_for_disconnect():
+                while (await receive())['type'] != 'http.disconnect':
+                    pass
+                self.disconnected.set()
+
+            watcher = asyncio.create_task(wait_for_disconnect())
+            try:
+                await loop.run_in_executor(self.executor, self.serve, body)
+            finally:
+                watcher.cancel()
+
+    def serve(self, body):
+        result = self.wsgi_application(self.build_environ(self.scope, body), self.start_response)
+        try:
+            for output in result:
+                # Client went away: stop generating (closes streaming responses)
+                if self.disconnected.is_set():
+                    return
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                self.sync_send({'type': 'http.response.body', 'body': output, 'more_body': True})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+wsgi_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_WSGI_THREADS', 64)), thread_name_prefix='wsgi'
+)
+
+
+async def wsgi_app(scope, receive, send):
+    await PooledWsgiInstance(flask_app.app, wsgi_executor)(scope, receive, send)
+
+
+# Blocking steps of the native routes; a stream holds a thread only while
+# one of its chunks is being read
+stream_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_STREAM_THREADS', 64)), thread_name_prefix='stream'
+)
+
+
+async def in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(stream_executor, fn, *args)
+
+
+async def send_json(send, data, status=200):
+    body = json.dumps(data).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def get_track(send, video_id):
+    try:
+        resolved = await in_thread(flask_app.stream_url_cache.get, video_id)
+    except Exception as e:
+        log.error("Error getting track: %s", e)
+        return await send_json(send, {'error': str(e)}, 500)
+    await send_json(send, flask_app.track_info(video_id, resolved))
+
+
+def close_after(read, response):
+    """Close a response once the chunk read in progress, if any, is done"""
+    if read is not None:
+        wait([read])
+    response.close()
+
+
+async def stream_track(scope, receive, send, video_id):
+    range_header = dict(scope['headers']).get(b'range')
+    try:
+        response = await in_thread(
+            flask_app.audio_response, video_id, range_header.decode('latin-1') if range_header else None, 'asgi'
+        )
+    except LookupError:
+        return await send_json(send, {'error': 'No audio URL found'}, 404)
+    except Exception as e:
+        log.error("Error streaming track: %s", e)
+        return await send_json(send, {'error': str(e)}, 500)
+
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()]
+    headers.append((b'access-control-allow-origin', b'*'))
+    chunks = iter(response.response)
+    read = None
+
+    async def pump():
+        nonlocal read
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        while True:
+            read = stream_executor.submit(next, chunks, None)
+            chunk = await asyncio.wrap_future(read)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    pump_task = asyncio.create_task(pump())
+    disconnect_task = asyncio.create_task(wait_for_disconnect())
+    try:
+        done, pending = await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if pump_task in done and pump_task.exception():
+            log.error("Error streaming track: %s", pump_task.exception())
+    finally:
+        # The generator may still be mid-read on a pool thread
+        await in_thread(close_after, read, response)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def timed_send(send, route):
+    """Wrap send to record time-to-headers like the Flask routes do"""
+    started = time.perf_counter()
+
+    async def send_and_time(message):
+        if message['type'] == 'http.response.start':
+            flask_app.http_request_seconds.observe(
+                time.perf_counter() - started, method='GET', route=route, status=message['status']
+            )
+        await send(message)
+
+    return send_and_time
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        match = STREAM_ROUTE.match(scope['path'])
+        if match:
+            send = timed_send(send, '/api/stream/<video_id>')
+            return await stream_track(scope, receive, send, match.group(1))
+        match = TRACK_ROUTE.match(scope['path'])
+        if match:
+            send = timed_send(send, '/api/track/<video_id>')
+            return await get_track(send, match.group(1))
+
+    await wsgi_app(scope, receive, send)
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def parse_range(header, total):
+    """(start, end) with end exclusive for a single-range header, else None.
+
+    Multi-range and unsatisfiable requests return None so the caller can
+    hand them to upstream untouched.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, total - int(last)), total
+    else:
+        start = int(first)
+        end = min(int(last) + 1, total) if last else total
+    if start >= end:
+        return None
+    return start, end
+
+
+def parse_content_range(header):
+    """(start, end, total) from an upstream Content-Range header, end exclusive"""
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    start, last, total = (int(g) for g in match.groups())
+    return start, last + 1, total
+
+
+class CachedAudio:
+    """One track on disk: a sparse file plus the byte spans already filled"""
+
+    def __init__(self, cache, key, meta):
+        self._cache = cache
+        self.key = key
+        self.path = cache.directory / f'{key}.data'
+        self.meta_path = cache.directory / f'{key}.json'
+        self.video_id = meta['video_id']
+        self.total = meta['total']
+        self.content_type = meta['content_type']
+        self.format_id = meta.get('format_id')
+        self.spans = [tuple(span) for span in meta.get('spans', [])]
+        self._lock = threading.Lock()
+
+    @property
+    def cached_bytes(self):
+        return sum(end - start for start, end in self.spans)
+
+    def plan(self, start, end):
+        """Split [start, end) into (cached, piece_start, piece_end) pieces"""
+        pieces = []
+        pos = start
+        with self._lock:
+            for span_start, span_end in self.spans:
+                if span_end <= pos:
+                    continue
+                if span_start >= end:
+                    break
+                if span_start > pos:
+                    pieces.append((False, pos, span_start))
+                pieces.append((True, max(pos, span_start), min(end, span_end)))
+                pos = min(end, span_end)
+        if pos < end:
+            pieces.append((False, pos, end))
+        return pieces
+
+    def covers(self, start, end):
+        return all(cached for cached, _, _ in self.plan(start, end))
+
+    @property
+    def current(self):
+        """False once the entry was evicted or replaced"""
+        return self._cache._entries.get(self.key) is self
+
+    def read(self, start, end, chunk_size):
+        """Yield cached bytes [start, end) from a memory map of the file"""
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for pos in range(start, end, chunk_size):
+                yield mm[pos:min(pos + chunk_size, end)]
+
+    def writer(self, offset):
+        """Return a function that stores consecutive chunks starting at offset.
+
+        Call it with no chunk when the stream ends to persist the new spans.
+        Disk errors and eviction mid-stream just stop the caching; they never
+        interrupt the stream being proxied.
+        """
+        state = {'fd': None, 'position': offset, 'failed': False}
+
+        def write(chunk=None):
+            if chunk is None:
+                if state['fd'] is not None:
+                    os.close(state['fd'])
+                    state['fd'] = None
+                    if self.current:
+                        self.save()
+                return
+            if state['failed'] or not self.current:
+                return
+            try:
+                if state['fd'] is None:
+                    state['fd'] = os.open(self.path, os.O_WRONLY)
+                os.pwrite(state['fd'], chunk, state['position'])
+            except OSError as e:
+                log.warning("Audio cache write failed for %s: %s", self.video_id, e)
+                state['failed'] = True
+                return
+            self._add_span(state['position'], state['position'] + len(chunk))
+            state['position'] += len(chunk)
+
+        return write
+
+    def _add_span(self, start, end):
+        with self._lock:
+            before = self.cached_bytes
+            merged = []
+            for span_start, span_end in self.spans:
+                if span_end < start or span_start > end:
+                    merged.append((span_start, span_end))
+                else:
+                    start, end = min(start, span_start), max(end, span_end)
+            merged.append((start, end))
+            merged.sort()
+            self.spans = merged
+            grown = self.cached_bytes - before
+        self._cache._grew(self, grown)
+
+    def save(self):
+        with self._lock:
+            meta = {
+                'video_id': self.video_id,
+                'total': self.total,
+                'content_type': self.content_type,
+                'format_id': self.format_id,
+                'spans': self.spans,
+            }
+        tmp = self.meta_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.meta_path)
+
+
+class AudioCache:
+    """Local cache of proxied audio bytes, filled while tracks stream.
+
+    Files are named by a hash of video_id so any source of the same track
+    lands in the same place. Byte ranges already on disk are served
+    without touching upstream; only the gaps are fetched. Total size is
+    capped by evicting the least recently played tracks.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hit_bytes = 0
+        self.miss_bytes = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self):
+        metas = []
+        for meta_path in self.directory.glob('*.json'):
+            try:
+                metas.append((meta_path.stat().st_mtime, meta_path.stem, json.loads(meta_path.read_text())))
+            except (OSError, ValueError):
+                continue
+        # Oldest first, so the LRU order survives restarts
+        for _, key, meta in sorted(metas, key=lambda m: m[0]):
+            entry = CachedAudio(self, key, meta)
+            if entry.path.exists():
+                self._entries[key] = entry
+                self.bytes_used += entry.cached_bytes
+
+    @staticmethod
+    def key_for(video_id):
+        return hashlib.sha1(video_id.encode()).hexdigest()
+
+    def get(self, video_id):
+        key = self.key_for(video_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def create(self, video_id, total, content_type, format_id=None):
+        """Start caching a track, replacing any older copy"""
+        key = self.key_for(video_id)
+        self.drop(video_id)
+        entry = CachedAudio(self, key, {
+            'video_id': video_id,
+            'total': total,
+            'content_type': content_type,
+            'format_id': format_id,
+        })
+        with open(entry.path, 'wb') as f:
+            f.truncate(total)
+        entry.save()
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def drop(self, video_id):
+        with self._lock:
+            entry = self._entries.pop(self.key_for(video_id), None)
+            if entry is not None:
+                self.bytes_used -= entry.cached_bytes
+        if entry is not None:
+            self._remove_files(entry)
+
+    def _remove_files(self, entry):
+        entry.path.unlink(missing_ok=True)
+        entry.meta_path.unlink(missing_ok=True)
+
+    def _grew(self, entry, grown):
+        evicted = []
+        with self._lock:
+            if self._entries.get(entry.key) is not entry:
+                return
+            self.bytes_used += grown
+            for key in list(self._entries):
+                if self.bytes_used <= self.max_bytes:
+                    break
+                if key == entry.key:
+                    continue
+                victim = self._entries.pop(key)
+                self.bytes_used -= victim.cached_bytes
+                self.evictions += 1
+                evicted.append(victim)
+        for victim in evicted:
+            self._remove_files(victim)
+
+    def record(self, hit_bytes=0, miss_bytes=0):
+        with self._lock:
+            self.hit_bytes += hit_bytes
+            self.miss_bytes += miss_bytes
+
+    def stats(self):
+        with self._lock:
+            served = self.hit_bytes + self.miss_bytes
+            return {
+                'tracks': len(self._entries),
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'hit_bytes': self.hit_bytes,
+                'miss_bytes': self.miss_bytes,
+                'byte_hit_ratio': round(self.hit_bytes / served, 3) if served else None,
+                'evictions': self.evictions,
+            }
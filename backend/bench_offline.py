@@ -0,0 +1,460 @@
+"""Offline, repeatable benchmark of the main endpoints.
+
+The app runs in a child process with ytmusicapi.YTMusic, yt_dlp.YoutubeDL
+and requests.Session swapped for stand-ins that replay recorded upstream
+responses; audio comes from a local Range-capable server in a third
+process. Nothing touches YouTube or Spotify, so numbers are comparable
+between commits. Each scenario runs at every concurrency level and reports
+latency percentiles and throughput:
+
+    python bench_offline.py                                   # synthetic fixtures
+    python bench_offline.py --concurrency 1,8,32 --json results.json
+    python bench_offline.py --mode asgi                       # uvicorn asgi:app
+    python bench_offline.py --latency-scale 1                 # replay upstream delays too
+
+Fixtures are synthetic unless --fixtures points at a recorded file. Record
+one (needs network) with:
+
+    python bench_offline.py --record fixtures.json --query "daft punk" --video-id dQw4w9WgXcQ
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+BACKEND_DIR = Path(__file__).parent
+SCENARIOS = [
+    'search', 'search_cached', 'recommendations', 'recommendations_cached',
+    'stream_seek', 'stream_full', 'share_playlist', 'share_track', 'lyrics', 'search_slow',
+]
+# search_slow's upstream delay, applied whatever --latency-scale is, so routes
+# that can't run concurrently (e.g. the ASGI pass-through) show up as such
+SLOW_UPSTREAM_SECONDS = 0.2
+# Bytes read per stream_seek request, like a browser seeking into a track
+SEEK_BYTES = 256 * 1024
+
+
+def synthetic_fixtures(tracks=20, audio_bytes=4 * 1024 * 1024):
+    """Upstream responses shaped like ytmusicapi/yt-dlp/Spotify output"""
+    def track(i):
+        video_id = f'bench{i:06d}'
+        return {
+            'videoId': video_id,
+            'title': f'Benchmark Song {i}',
+            'artists': [{'name': f'Artist {i % 7}', 'id': f'UC{i % 7:022d}'}],
+            'album': {'name': f'Album {i % 5}', 'id': f'MPRE{i % 5:013d}'},
+            'duration': '3:30',
+            'duration_seconds': 210,
+            'thumbnails': [
+                {'url': f'https://lh3.googleusercontent.com/{video_id}=w60-h60-l90-rj', 'width': 60, 'height': 60},
+                {'url': f'https://lh3.googleusercontent.com/{video_id}=w120-h120-l90-rj', 'width': 120, 'height': 120},
+            ],
+            'resultType': 'song',
+        }
+
+    results = [track(i) for i in range(tracks)]
+    return {
+        'search': {'benchmark': {'elapsed': 0.6, 'results': results}},
+        'watch_playlist': {results[0]['videoId']: {'elapsed': 0.5, 'result': {'tracks': results}}},
+        'ytdlp': {results[0]['videoId']: {'elapsed': 2.5, 'info': {
+            'title': results[0]['title'], 'duration': 210, 'ext': 'm4a', 'format_id': '140',
+            'acodec': 'mp4a.40.2', 'abr': 129.5, 'filesize': audio_bytes,
+        }}},
+        'spotify_tracks': {'4uLU6hMCjMI75M1A2tKUQC': {'elapsed': 0.15, 'track': {
+            'id': '4uLU6hMCjMI75M1A2tKUQC',
+            'name': 'Benchmark Track',
+            'artists': [{'name': 'Benchmark Artist'}],
+            'album': {'name': 'Benchmark Album', 'images': [{'url': 'https://i.scdn.co/image/bench'}]},
+            'duration_ms': 210000,
+            'preview_url': None,
+            'external_urls': {'spotify': 'https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC'},
+        }}},
+        'thumbnail_elapsed': 0.05,
+        'audio_bytes': audio_bytes,
+    }
+
+
+def record_fixtures(path, queries, video_ids):
+    """Capture live responses (and how long they took) into a fixtures file"""
+    import yt_dlp
+    from ytmusicapi import YTMusic
+
+    fixtures = synthetic_fixtures()
+    fixtures['search'], fixtures['watch_playlist'], fixtures['ytdlp'] = {}, {}, {}
+    ytmusic = YTMusic()
+    for query in queries:
+        started = time.perf_counter()
+        results = ytmusic.search(query, filter='songs', limit=20)
+        fixtures['search'][query] = {'elapsed': round(time.perf_counter() - started, 3), 'results': results}
+        print(f"✓ search {query!r}: {len(results)} results")
+    for video_id in video_ids:
+        started = time.perf_counter()
+        playlist = ytmusic.get_watch_playlist(videoId=video_id, limit=20)
+        fixtures['watch_playlist'][video_id] = {'elapsed': round(time.perf_counter() - started, 3), 'result': playlist}
+        started = time.perf_counter()
+        with yt_dlp.YoutubeDL({'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best', 'quiet': True}) as ydl:
+            info = ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
+        keep = ('title', 'duration', 'ext', 'format_id', 'acodec', 'abr', 'filesize')
+        fixtures['ytdlp'][video_id] = {
+            'elapsed': round(time.perf_counter() - started, 3),
+            'info': {k: info.get(k) for k in keep},
+        }
+        print(f"✓ watch playlist + yt-dlp {video_id}")
+    Path(path).write_text(json.dumps(fixtures, indent=2))
+    print(f"Wrote {path}")
+
+
+def first(mapping):
+    return next(iter(mapping.values()))
+
+
+def install_stand_ins(fixtures, latency_scale, audio_url):
+    """Swap the upstream clients for replaying stand-ins; call before `import app`"""
+    import requests
+    import yt_dlp
+    import ytmusicapi
+
+    def replay(elapsed):
+        if latency_scale and elapsed:
+            time.sleep(elapsed * latency_scale)
+
+    class ReplayYTMusic:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def search(self, query, filter=None, limit=20, **kwargs):
+            if query.startswith('slow '):
+                time.sleep(SLOW_UPSTREAM_SECONDS)
+            recorded = fixtures['search'].get(query) or first(fixtures['search'])
+            replay(recorded['elapsed'])
+            return json.loads(json.dumps(recorded['results']))[:limit]
+
+        def get_watch_playlist(self, videoId=None, limit=25, **kwargs):
+            recorded = fixtures['watch_playlist'].get(videoId) or first(fixtures['watch_playlist'])
+            replay(recorded['elapsed'])
+            return json.loads(json.dumps(recorded['result']))
+
+    class ReplayYoutubeDL:
+        def __init__(self, params=None):
+            self.params = params or {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download=False):
+            video_id = url.rsplit('v=', 1)[-1]
+            recorded = fixtures['ytdlp'].get(video_id) or first(fixtures['ytdlp'])
+            replay(recorded['elapsed'])
+            expire = int(time.time()) + 6 * 3600
+            return {**recorded['info'], 'id': video_id, 'url': f'{audio_url}/{video_id}?expire={expire}'}
+
+    def canned(status, body=None):
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = json.dumps(body).encode() if body is not None else b''
+        resp.headers['Content-Type'] = 'application/json'
+        return resp
+
+    class ReplaySession(requests.Session):
+        """Local URLs go over the network; known upstreams are answered from fixtures"""
+
+        def request(self, method, url, *args, **kwargs):
+            parsed = urlparse(url)
+            if parsed.hostname in ('127.0.0.1', 'localhost'):
+                return super().request(method, url, *args, **kwargs)
+            if parsed.hostname == 'i.ytimg.com':
+                replay(fixtures['thumbnail_elapsed'])
+                return canned(200)
+            if parsed.hostname == 'accounts.spotify.com':
+                return canned(200, {'access_token': 'bench', 'expires_in': 3600})
+            if parsed.hostname == 'api.spotify.com':
+                # /v1/tracks?ids=a,b: one call costs its slowest recorded track
+                recorded = [fixtures['spotify_tracks'].get(t) for t in kwargs.get('params', {}).get('ids', '').split(',')]
+                replay(max((r['elapsed'] for r in recorded if r), default=0))
+                return canned(200, {'tracks': [r['track'] if r else None for r in recorded]})
+            return canned(404)
+
+    ytmusicapi.YTMusic = ReplayYTMusic
+    yt_dlp.YoutubeDL = ReplayYoutubeDL
+    requests.Session = ReplaySession
+
+
+def serve_audio(port, size):
+    """Deterministic audio bytes with single-range support, like googlevideo"""
+    data = bytes(range(256)) * (size // 256)
+
+    class AudioHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            range_header = self.headers.get('Range')
+            if range_header:
+                first_byte, last_byte = range_header.split('=', 1)[1].split('-')
+                start = int(first_byte)
+                end = min(int(last_byte) + 1 if last_byte else len(data), len(data))
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(data)}')
+            else:
+                start, end = 0, len(data)
+                self.send_response(200)
+            self.send_header('Content-Type', 'audio/mp4')
+            self.send_header('Content-Length', str(end - start))
+            self.end_headers()
+            try:
+                self.wfile.write(memoryview(data)[start:end])
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    ThreadingHTTPServer(('127.0.0.1', port), AudioHandler).serve_forever()
+
+
+def serve_app(args, fixtures):
+    # Every cache and store lives in a fresh directory so runs don't share
+    # state, including whatever app.py puts under tempfile.gettempdir() (the
+    # legacy lyrics import would otherwise take over the real nova_lyrics_cache)
+    state = Path(args.state_dir)
+    os.environ.update({
+        'TMPDIR': str(state),
+        'AUDIO_CACHE_DIR': str(state / 'audio'),
+        'AUDIO_CACHE_MAX_BYTES': str(2 * 1024 ** 3),
+        'THUMBNAIL_CACHE_PATH': str(state / 'thumbnails.sqlite3'),
+        'LYRICS_DB_PATH': str(state / 'lyrics.sqlite3'),
+        'LYRICS_LEGACY_DIR': '',
+        'SHARE_STORE_PATH': str(state / 'shares'),
+        'SPOTIFY_TOKEN': 'bench',
+        'LOG_LEVEL': 'WARNING',
+    })
+    tempfile.tempdir = None  # re-read TMPDIR on the next gettempdir()
+    install_stand_ins(fixtures, args.latency_scale, f'http://127.0.0.1:{args.audio_port}')
+    sys.path.insert(0, str(BACKEND_DIR))
+    import app
+
+    # Lyrics lookups read what a finished transcription would have stored
+    for i in range(100):
+        app.lyrics_store.put(f'lyrics{i:03d}', {
+            'lyrics': '\n'.join(f'line {n}' for n in range(60)),
+            'source': 'whisper_ai',
+            'synced': True,
+            'segments': [{'start': n * 3.5, 'text': f'line {n}'} for n in range(60)],
+        })
+
+    if args.mode == 'asgi':
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.app, host='127.0.0.1', port=args.port, log_level='warning')
+    else:
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        make_server('127.0.0.1', args.port, app.app, threaded=True).serve_forever()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_scenario(base_url, name, concurrency, duration, context):
+    import httpx
+
+    counter = {'n': 0}
+    # Same seek offsets on every run
+    rng = random.Random(0)
+    audio_bytes = context['audio_bytes']
+    video_ids = context['video_ids']
+
+    def next_request(worker_id):
+        counter['n'] += 1
+        n = counter['n']
+        # Each worker is its own search client, or they'd supersede each other
+        if name == 'search':
+            return f'/api/search?q=benchmark+{n}&client=bench{worker_id}', {}
+        if name == 'search_cached':
+            return f'/api/search?q=benchmark+cached+{n % 5}&client=bench{worker_id}', {}
+        if name == 'search_slow':
+            return f'/api/search?q=slow+{n}', {}
+        if name == 'recommendations':
+            return f'/api/recommendations/rec{n:08d}', {}
+        if name == 'recommendations_cached':
+            return f'/api/recommendations/{video_ids[n % len(video_ids)]}', {}
+        if name == 'stream_seek':
+            start = rng.randrange(0, audio_bytes - SEEK_BYTES)
+            return f'/api/stream/{video_ids[n % len(video_ids)]}', {'Range': f'bytes={start}-{start + SEEK_BYTES - 1}'}
+        if name == 'stream_full':
+            return f'/api/stream/{video_ids[n % len(video_ids)]}', {}
+        if name == 'share_playlist':
+            return f"/playlist/{context['share_id']}", {}
+        if name == 'share_track':
+            return '/share/4uLU6hMCjMI75M1A2tKUQC', {}
+        return f'/api/lyrics/lyrics{n % 100:03d}', {}
+
+    latencies = []
+    errors = 0
+    received = 0
+
+    async def worker(worker_id, client, deadline):
+        nonlocal errors, received
+        while time.perf_counter() < deadline:
+            path, headers = next_request(worker_id)
+            started = time.perf_counter()
+            try:
+                resp = await client.get(base_url + path, headers=headers)
+                if resp.status_code >= 400:
+                    errors += 1
+                    continue
+                received += len(resp.content)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker(i, client, deadline) for i in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        'mb_per_s': round(received / wall / 1e6, 1),
+    }
+
+
+async def prepare(base_url, fixtures):
+    """Wait for the server, then create the data the scenarios read"""
+    import httpx
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        for _ in range(300):
+            try:
+                if (await client.get(f'{base_url}/api/health')).status_code == 200:
+                    break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError('Benchmark server did not start')
+
+        playlist = {
+            'id': 'bench-playlist',
+            'createdAt': 1,
+            'name': 'Benchmark playlist',
+            'description': 'Offline benchmark',
+            'tracks': first(fixtures['search'])['results'],
+        }
+        share_id = (await client.post(f'{base_url}/api/create-playlist-share', json=playlist)).json()['shareId']
+        # Resolve stream URLs and fill the audio cache up front, so stream
+        # scenarios measure steady-state proxying rather than first plays
+        video_ids = [f'stream{i:03d}' for i in range(8)]
+        for video_id in video_ids:
+            await client.get(f'{base_url}/api/stream/{video_id}')
+    return {'share_id': share_id, 'video_ids': video_ids, 'audio_bytes': fixtures['audio_bytes']}
+
+
+def free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated subset to run')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per scenario and level')
+    parser.add_argument('--mode', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--fixtures', help='recorded fixtures file (default: synthetic)')
+    parser.add_argument('--latency-scale', type=float, default=0,
+                        help='replay recorded upstream delays x this factor (0 = answer instantly)')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--record', help='record live upstream responses into this fixtures file')
+    parser.add_argument('--query', action='append', default=[], help='search query to record (repeatable)')
+    parser.add_argument('--video-id', action='append', default=[], help='video id to record (repeatable)')
+    # Internal: the child processes
+    parser.add_argument('--serve', choices=['app', 'audio'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--audio-port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--state-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.record:
+        return record_fixtures(args.record, args.query or ['benchmark'], args.video_id or ['dQw4w9WgXcQ'])
+
+    fixtures = json.loads(Path(args.fixtures).read_text()) if args.fixtures else synthetic_fixtures()
+    if args.serve == 'audio':
+        return serve_audio(args.port, fixtures['audio_bytes'])
+    if args.serve == 'app':
+        return serve_app(args, fixtures)
+
+    port, audio_port = free_port(), free_port()
+    state_dir = tempfile.mkdtemp(prefix='nova_bench_')
+    common = [sys.executable, __file__, '--latency-scale', str(args.latency_scale)]
+    if args.fixtures:
+        common += ['--fixtures', args.fixtures]
+    children = [
+        subprocess.Popen(common + ['--serve', 'audio', '--port', str(audio_port)]),
+        subprocess.Popen(common + [
+            '--serve', 'app', '--mode', args.mode, '--port', str(port),
+            '--audio-port', str(audio_port), '--state-dir', state_dir,
+        ]),
+    ]
+    base_url = f'http://127.0.0.1:{port}'
+    results = {}
+    try:
+        context = asyncio.run(prepare(base_url, fixtures))
+        print(f"{'scenario':>24} {'conc':>5} {'req':>7} {'err':>4} {'req/s':>8} "
+              f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'MB/s':>7}")
+        for name in args.scenarios.split(','):
+            results[name] = []
+            for level in [int(n) for n in args.concurrency.split(',')]:
+                summary = asyncio.run(run_scenario(base_url, name, level, args.duration, context))
+                results[name].append(summary)
+                print(f"{name:>24} {level:>5} {summary['requests']:>7} {summary['errors']:>4} {summary['rps']:>8} "
+                      f"{str(summary['p50_ms']):>8} {str(summary['p90_ms']):>8} {str(summary['p99_ms']):>8} "
+                      f"{summary['mb_per_s']:>7}")
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'mode': args.mode,
+                'latency_scale': args.latency_scale,
+                'duration': args.duration,
+                'fixtures': args.fixtures or 'synthetic',
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
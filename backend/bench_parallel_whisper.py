@@ -0,0 +1,115 @@
+"""Latency of one song's transcription by chunk count, checked against a sequential run.
+
+chunks=1 is the sequential reference: one model.transcribe() in this process
+with every core. Each other count runs through ParallelTranscriber with that
+many workers (language detection included, model loading not) and is
+compared with the reference:
+  similarity  difflib ratio of the two word sequences (1.0 = same words)
+  max shift   largest start difference (s) between lines both runs produced
+
+    python bench_parallel_whisper.py song.m4a --chunks 1,2,4,8 --model base
+    python bench_parallel_whisper.py song.m4a --min-similarity 0.95 --json results.json
+
+Exits with status 1 if any chunk count falls below --min-similarity.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import replace
+from difflib import SequenceMatcher
+
+from parallel_whisper import SAMPLE_RATE, ParallelTranscriber
+from whisper_profile import WhisperProfile, lyrics_lines
+
+
+def _csv(cast):
+    return lambda value: [cast(v) for v in value.split(',') if v]
+
+
+def sequential(model, profile, audio):
+    segments, info = model.transcribe(audio, word_timestamps=False, **profile.transcribe_options())
+    return list(lyrics_lines(segments)), info.language
+
+
+def compare(reference, segments):
+    """(word similarity, max start shift of matching lines)"""
+    ref_words = ' '.join(s['text'] for s in reference).split()
+    words = ' '.join(s['text'] for s in segments).split()
+    similarity = SequenceMatcher(None, ref_words, words, autojunk=False).ratio()
+
+    lines = SequenceMatcher(None, [s['text'] for s in reference], [s['text'] for s in segments], autojunk=False)
+    shifts = [
+        abs(reference[a + k]['start'] - segments[b + k]['start'])
+        for a, b, size in lines.get_matching_blocks()
+        for k in range(size)
+    ]
+    return round(similarity, 3), round(max(shifts, default=0.0), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', help='audio file to transcribe (any format ffmpeg/PyAV reads)')
+    parser.add_argument('--chunks', type=_csv(int), default=[1, 2, 4, 8])
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--compute-type', default='int8')
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--min-chunk-seconds', type=float, default=20)
+    parser.add_argument('--min-similarity', type=float, default=0.9)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    from faster_whisper.audio import decode_audio
+    audio = decode_audio(args.audio, sampling_rate=SAMPLE_RATE)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    profile = WhisperProfile(model=args.model, compute_type=args.compute_type, beam_size=args.beam_size)
+
+    print(f"Audio: {args.audio} ({audio_seconds:.1f}s), {os.cpu_count()} CPUs")
+    model = replace(profile, cpu_threads=os.cpu_count() or 0).load()
+    start = time.perf_counter()
+    reference, language = sequential(model, profile, audio)
+    reference_seconds = time.perf_counter() - start
+
+    print(f"{'chunks':>6} {'used':>5} {'run s':>7} {'RTF':>6} {'speedup':>7} {'similar':>7} {'shift s':>7}")
+    results = [{
+        'chunks': 1, 'used': 1, 'seconds': round(reference_seconds, 2),
+        'rtf': round(reference_seconds / audio_seconds, 3), 'speedup': 1.0,
+        'similarity': 1.0, 'max_shift': 0.0, 'segments': len(reference),
+    }]
+    for chunks in args.chunks:
+        if chunks <= 1:
+            continue
+        transcriber = ParallelTranscriber(profile, chunks, min_chunk_seconds=args.min_chunk_seconds)
+        transcriber.warm()
+        start = time.perf_counter()
+        _, info = model.transcribe(audio[:SAMPLE_RATE * 30], **profile.transcribe_options())
+        segments = transcriber.transcribe(audio, info.language)
+        seconds = time.perf_counter() - start
+        used = transcriber.stats()['chunks']
+        transcriber.shutdown()
+
+        similarity, shift = compare(reference, segments)
+        results.append({
+            'chunks': chunks, 'used': used, 'seconds': round(seconds, 2),
+            'rtf': round(seconds / audio_seconds, 3), 'speedup': round(reference_seconds / seconds, 2),
+            'similarity': similarity, 'max_shift': shift, 'segments': len(segments),
+        })
+
+    for r in results:
+        print(f"{r['chunks']:>6} {r['used']:>5} {r['seconds']:>7} {r['rtf']:>6} "
+              f"{r['speedup']:>7} {r['similarity']:>7} {r['max_shift']:>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'cpus': os.cpu_count(), 'language': language, 'audio_seconds': round(audio_seconds, 2),
+                       'results': results}, f, indent=2)
+
+    failed = [r['chunks'] for r in results if r['similarity'] < args.min_similarity]
+    if failed:
+        print(f"Output differs from the sequential run (similarity < {args.min_similarity}) for chunks={failed}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Requests/second for the share pages, in-process via the Flask test client.
+
+Rendering alone, for a playlist share page:
+  legacy    re-read template + str.replace chain (the old per-request work)
+  compiled  the same page from the precompiled template
+Full requests to /playlist/<id>:
+  uncached  page cache cleared before every request
+  cached    rendered page served from the page cache
+  304       conditional request with the page's ETag
+
+    python bench_share_pages.py --tracks 50 --seconds 3
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import app
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def legacy_render(share_file, share_id, url_root):
+    """The per-request work /playlist/<id> used to do"""
+    with open(share_file, 'r') as f:
+        playlist = json.load(f)
+    with open(BACKEND_DIR / 'playlist_share_template.html', 'r', encoding='utf-8') as f:
+        template = f.read()
+    tracks = playlist.get('tracks', [])
+    covers = [t['album']['images'][0].get('url', '') for t in tracks[:4] if t.get('album', {}).get('images')]
+    html = template.replace('{{playlist_name}}', playlist.get('name', 'Untitled Playlist'))
+    html = html.replace('{{playlist_description}}', playlist.get('description', '') or 'No description')
+    html = html.replace('{{track_count}}', str(len(tracks)))
+    html = html.replace('{{share_url}}', f'{url_root}playlist/{share_id}')
+    html = html.replace('{{app_url}}', f'http://localhost:5173?playlist={share_id}')
+    html = html.replace('{{share_id}}', share_id)
+    for i in range(4):
+        html = html.replace(f'{{{{cover_{i+1}}}}}', covers[i] if i < len(covers) else '')
+    return html.replace('{{tracks_json}}', json.dumps(tracks))
+
+
+def compiled_render(share_file, share_id, url_root):
+    with open(share_file, 'r') as f:
+        playlist = json.load(f)
+    tracks = playlist.get('tracks', [])
+    covers = [t['album']['images'][0].get('url', '') for t in tracks[:4] if t.get('album', {}).get('images')]
+    values = {
+        'playlist_name': playlist.get('name', 'Untitled Playlist'),
+        'playlist_description': playlist.get('description', '') or 'No description',
+        'track_count': len(tracks),
+        'share_url': f'{url_root}playlist/{share_id}',
+        'app_url': f'http://localhost:5173?playlist={share_id}',
+        'share_id': share_id,
+        'tracks_json': json.dumps(tracks),
+    }
+    for i in range(4):
+        values[f'cover_{i+1}'] = covers[i] if i < len(covers) else ''
+    return app.PLAYLIST_SHARE_TEMPLATE.render(values)
+
+
+def rate(fn, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        count += 1
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=50, help='tracks in the benchmark playlist')
+    parser.add_argument('--seconds', type=float, default=3, help='time per scenario')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    client = app.app.test_client()
+    playlist = {
+        'id': 'bench',
+        'createdAt': time.time(),
+        'name': 'Benchmark playlist',
+        'description': 'Share page benchmark',
+        'tracks': [{
+            'id': f'track{i}',
+            'name': f'Track {i}',
+            'artists': [{'name': f'Artist {i}'}],
+            'album': {'name': f'Album {i}', 'images': [{'url': f'https://i.ytimg.com/vi/v{i}/hqdefault.jpg'}]},
+            'duration_ms': 200000,
+        } for i in range(args.tracks)],
+    }
+    share_id = client.post('/api/create-playlist-share', json=playlist).get_json()['shareId']
+    path = f'/playlist/{share_id}'
+    # The render-only scenarios read a flat JSON file like the old code did
+    share_file = Path(tempfile.gettempdir()) / f'nova_bench_{share_id}.json'
+    share_file.write_text(json.dumps(playlist))
+
+    def uncached():
+        app.share_page_cache._entries.clear()
+        client.get(path)
+
+    etag = client.get(path).headers['ETag']
+    scenarios = {
+        'legacy': lambda: legacy_render(share_file, share_id, 'http://localhost/'),
+        'compiled': lambda: compiled_render(share_file, share_id, 'http://localhost/'),
+        'uncached': uncached,
+        'cached': lambda: client.get(path),
+        '304': lambda: client.get(path, headers={'If-None-Match': etag}),
+    }
+    assert compiled_render(share_file, share_id, 'http://localhost/') == legacy_render(share_file, share_id, 'http://localhost/')
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    results = {}
+    for name, fn in scenarios.items():
+        results[name] = round(rate(fn, args.seconds))
+        print(f"{name:>8} {results[name]:>8} req/s")
+
+    share_file.unlink(missing_ok=True)
+    app.share_store.delete(share_id)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'tracks': args.tracks, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
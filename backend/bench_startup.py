@@ -0,0 +1,136 @@
+"""Where backend startup time goes, and how soon /api/health answers.
+
+  imports  `python -X importtime -c "import app"` in a fresh interpreter: total
+           import time and the slowest modules (cumulative, as imported by app)
+  deferred heavy modules that `import app` must not load (they are imported on
+           first use or by the background warm-up)
+  health   seconds from starting the server process to the first 200 from
+           /api/health, then until the background warm-up has finished
+
+    python bench_startup.py
+    python bench_startup.py --mode asgi --top 20 --max-health-seconds 1 --json startup.json
+
+Exits with status 1 if a deferred module is loaded at import time or the
+server isn't healthy within --max-health-seconds.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+DEFERRED = ('yt_dlp', 'ytmusicapi', 'requests', 'urllib3', 'faster_whisper')
+
+
+def import_times(top):
+    """(total ms, [(module, cumulative ms)], [deferred modules that were loaded])"""
+    code = f"import app, sys; print(','.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR, capture_output=True, text=True, env={**os.environ, 'WARMUP_DELAY': '-1'},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip()[-500:])
+
+    modules = []
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time: self | cumulative | <two spaces per nesting level>name"
+        _, cumulative, raw = line[len('import time:'):].split('|')
+        name = raw.strip()
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        # Children are listed before their parent, so app's own imports are
+        # the depth-1 lines since the previous top-level one
+        if depth == 0:
+            if name == 'app':
+                total = int(cumulative)
+                break
+            modules = []
+        elif depth == 1:
+            modules.append((name, int(cumulative) / 1000))
+    modules.sort(key=lambda m: m[1], reverse=True)
+    loaded = [m for m in proc.stdout.strip().split(',') if m]
+    return total / 1000, modules[:top], loaded
+
+
+def get_json(url, timeout=0.5):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.status, json.load(resp)
+
+
+def time_to_healthy(mode, port, timeout):
+    """(seconds to first healthy /api/health, seconds until warmed or None)"""
+    env = {**os.environ, 'PORT': str(port), 'FLASK_DEBUG': '0', 'LOG_LEVEL': 'WARNING'}
+    if mode == 'asgi':
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, 'app.py']
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    healthy = warmed = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f'server exited with status {proc.returncode}')
+            try:
+                if healthy is None:
+                    status, _ = get_json(f'http://127.0.0.1:{port}/api/health')
+                    if status == 200:
+                        healthy = time.perf_counter() - start
+                else:
+                    _, stats = get_json(f'http://127.0.0.1:{port}/api/cache/stats', timeout=5)
+                    if stats.get('startup', {}).get('warmed'):
+                        warmed = time.perf_counter() - start
+                        break
+            except OSError:
+                pass
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return healthy, warmed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('flask', 'asgi'), default='flask')
+    parser.add_argument('--port', type=int, default=5091)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--max-health-seconds', type=float, default=1.0)
+    parser.add_argument('--timeout', type=float, default=60, help='give up on the server after this long')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    total, modules, loaded = import_times(args.top)
+    print(f"import app: {total:.0f} ms")
+    for name, ms in modules:
+        print(f"  {ms:>8.1f} ms  {name}")
+    print(f"deferred modules loaded at import: {', '.join(loaded) or 'none'}")
+
+    healthy, warmed = time_to_healthy(args.mode, args.port, args.timeout)
+    print(f"/api/health ok after: {f'{healthy:.2f} s' if healthy is not None else 'never'} ({args.mode})")
+    print(f"upstream clients warmed after: {f'{warmed:.2f} s' if warmed is not None else 'not seen'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'mode': args.mode,
+                'import_ms': round(total, 1),
+                'slowest_imports': [{'module': name, 'ms': round(ms, 1)} for name, ms in modules],
+                'deferred_loaded': loaded,
+                'health_seconds': round(healthy, 3) if healthy is not None else None,
+                'warmed_seconds': round(warmed, 3) if warmed is not None else None,
+            }, f, indent=2)
+
+    if loaded or healthy is None or healthy > args.max_health_seconds:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
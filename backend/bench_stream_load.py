@@ -0,0 +1,127 @@
+"""Concurrent-listener load test for /api/stream.
+
+Opens N simultaneous streams that each read at playback speed, and reports
+how many kept up, time to first byte and (with --pid, Linux only) the
+server's thread count and CPU time. --rate 0 reads as fast as possible
+instead, for proxy throughput and CPU per GB (e.g. to compare
+STREAM_CHUNK_SIZE values). Run it once against each serving mode:
+
+    python app.py                                  # threaded Flask
+    uvicorn asgi:app --port 5001                   # async mode
+    python bench_stream_load.py --video-id dQw4w9WgXcQ --listeners 50,200,1000 --pid <server pid>
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+
+def read_proc(pid):
+    """(threads, cpu seconds) for a process, from /proc"""
+    with open(f'/proc/{pid}/status') as f:
+        threads = next(int(line.split()[1]) for line in f if line.startswith('Threads:'))
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    ticks = os.sysconf('SC_CLK_TCK')
+    return threads, (int(fields[11]) + int(fields[12])) / ticks
+
+
+async def listener(client, url, duration, rate):
+    """Stream for `duration` seconds reading no faster than `rate` bytes/s (0 = unthrottled)"""
+    start = time.perf_counter()
+    ttfb = None
+    received = 0
+    try:
+        async with client.stream('GET', url) as resp:
+            if resp.status_code not in (200, 206):
+                return {'ok': False, 'error': f'HTTP {resp.status_code}'}
+            async for chunk in resp.aiter_raw(16 * 1024):
+                now = time.perf_counter()
+                if ttfb is None:
+                    ttfb = now - start
+                received += len(chunk)
+                elapsed = now - start
+                if elapsed >= duration:
+                    break
+                if rate:
+                    ahead = received / rate - elapsed
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+    except Exception as e:
+        return {'ok': False, 'error': type(e).__name__, 'ttfb': ttfb}
+    elapsed = time.perf_counter() - start
+    # Kept up if it got at least 90% of realtime for the whole window
+    return {'ok': received >= 0.9 * rate * min(elapsed, duration), 'ttfb': ttfb, 'bytes': received, 'seconds': elapsed}
+
+
+async def run_level(base_url, video_ids, listeners, duration, rate, pid):
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=0)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60), limits=limits) as client:
+        urls = [f'{base_url}/api/stream/{video_ids[i % len(video_ids)]}' for i in range(listeners)]
+        cpu_before = read_proc(pid)[1] if pid else None
+        peak_threads = 0
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(listener(client, url, duration, rate)) for url in urls]
+        while not all(t.done() for t in tasks):
+            if pid:
+                peak_threads = max(peak_threads, read_proc(pid)[0])
+            await asyncio.sleep(0.5)
+        results = [t.result() for t in tasks]
+        wall = time.perf_counter() - started
+
+    ttfbs = sorted(r['ttfb'] for r in results if r.get('ttfb') is not None)
+    summary = {
+        'listeners': listeners,
+        'kept_up': sum(1 for r in results if r['ok']),
+        'errors': sum(1 for r in results if r.get('error')),
+        'ttfb_p50': round(statistics.median(ttfbs), 3) if ttfbs else None,
+        'ttfb_p95': round(ttfbs[int(len(ttfbs) * 0.95) - 1], 3) if ttfbs else None,
+        'mbytes': round(sum(r.get('bytes', 0) for r in results) / 1e6, 1),
+    }
+    summary['mb_per_s'] = round(summary['mbytes'] / wall, 1)
+    if pid:
+        summary['peak_threads'] = peak_threads
+        summary['cpu_seconds'] = round(read_proc(pid)[1] - cpu_before, 2)
+        if summary['mbytes']:
+            summary['cpu_s_per_gb'] = round(summary['cpu_seconds'] / summary['mbytes'] * 1000, 2)
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--video-id', action='append', required=True, help='repeat to spread load over tracks')
+    parser.add_argument('--listeners', default='10,50,200', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=20, help='seconds each listener streams')
+    parser.add_argument('--rate', type=int, default=24000, help='bytes/s per listener (24000 ~ 192 kbps, 0 = as fast as possible)')
+    parser.add_argument('--pid', type=int, help='server process id to sample threads/CPU from')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    # Resolve once up front so the first level doesn't measure yt-dlp
+    async with httpx.AsyncClient(timeout=60) as client:
+        for video_id in args.video_id:
+            await client.get(f'{args.url}/api/track/{video_id}')
+
+    results = []
+    print(f"{'listeners':>9} {'kept up':>8} {'errors':>6} {'ttfb p50':>8} {'ttfb p95':>8} {'MB':>7} "
+          f"{'MB/s':>6} {'threads':>7} {'cpu s':>6} {'cpu s/GB':>8}")
+    for level in [int(n) for n in args.listeners.split(',')]:
+        summary = await run_level(args.url, args.video_id, level, args.duration, args.rate, args.pid)
+        results.append(summary)
+        print(f"{level:>9} {summary['kept_up']:>8} {summary['errors']:>6} {str(summary['ttfb_p50']):>8} "
+              f"{str(summary['ttfb_p95']):>8} {summary['mbytes']:>7} {summary['mb_per_s']:>6} "
+              f"{str(summary.get('peak_threads', '-')):>7} {str(summary.get('cpu_seconds', '-')):>6} "
+              f"{str(summary.get('cpu_s_per_gb', '-')):>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': args.url, 'rate': args.rate, 'duration': args.duration, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Measure Whisper realtime factor per model/compute profile.
+
+Realtime factor (RTF) = transcription seconds / audio seconds, so 0.25 means
+a 4-minute song takes one minute. Use it to size CPU-only nodes.
+
+    python bench_whisper.py song.m4a --models tiny,base,small --cpu-threads 2,4,8
+    python bench_whisper.py song.m4a --beam-sizes 1,5 --vad --json results.json
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+
+from whisper_profile import WhisperProfile
+
+
+def _csv(cast):
+    return lambda value: [cast(v) for v in value.split(',') if v]
+
+
+def run_profile(profile, audio, audio_seconds):
+    start = time.perf_counter()
+    model = profile.load()
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments, info = model.transcribe(audio, **profile.transcribe_options())
+    segment_count = sum(1 for _ in segments)
+    transcribe_seconds = time.perf_counter() - start
+
+    return {
+        'profile': profile.as_dict(),
+        'language': info.language,
+        'segments': segment_count,
+        'audio_seconds': round(audio_seconds, 2),
+        'load_seconds': round(load_seconds, 2),
+        'transcribe_seconds': round(transcribe_seconds, 2),
+        'rtf': round(transcribe_seconds / audio_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', help='audio file to transcribe (any format ffmpeg/PyAV reads)')
+    parser.add_argument('--models', type=_csv(str), default=['tiny', 'base', 'small'])
+    parser.add_argument('--compute-types', type=_csv(str), default=['int8'])
+    parser.add_argument('--cpu-threads', type=_csv(int), default=[0])
+    parser.add_argument('--beam-sizes', type=_csv(int), default=[5])
+    parser.add_argument('--vad', action='store_true', help='also run every profile with vad_filter on')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    from faster_whisper.audio import decode_audio
+    audio = decode_audio(args.audio, sampling_rate=16000)
+    audio_seconds = len(audio) / 16000
+
+    print(f"Audio: {args.audio} ({audio_seconds:.1f}s), {os.cpu_count()} CPUs")
+    print(f"{'model':<8} {'compute':<8} {'threads':>7} {'beam':>4} {'vad':>5} {'load s':>7} {'run s':>7} {'RTF':>6}")
+
+    results = []
+    vad_options = [False, True] if args.vad else [False]
+    for model, compute_type, threads, beam, vad in itertools.product(
+            args.models, args.compute_types, args.cpu_threads, args.beam_sizes, vad_options):
+        profile = WhisperProfile(model=model, compute_type=compute_type, cpu_threads=threads,
+                                 beam_size=beam, vad_filter=vad)
+        result = run_profile(profile, audio, audio_seconds)
+        results.append(result)
+        print(f"{model:<8} {compute_type:<8} {threads:>7} {beam:>4} {str(vad):>5} "
+              f"{result['load_seconds']:>7} {result['transcribe_seconds']:>7} {result['rtf']:>6}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
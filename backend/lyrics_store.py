@@ -0,0 +1,224 @@
+"""Lyrics cache in one SQLite file instead of one JSON file per video.
+
+Each row holds zlib-compressed compact JSON. Writes are transactions, so a
+crash can't leave a torn entry. The file is capped at max_bytes by dropping
+the least recently read lyrics, and a small in-memory LRU serves the hottest
+songs without touching SQLite.
+
+Old per-video JSON files are imported by migrate(), or one at a time the
+first time get() misses on them:
+
+    python lyrics_store.py /tmp/nova_lyrics_cache
+"""
+import json
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+# Reads only refresh accessed_at (a write) when it is older than this
+TOUCH_INTERVAL = 3600
+
+
+def encode(data):
+    return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def quarantine(legacy_file):
+    """Rename an unparseable legacy file to <id>.json.bad so it is only tried once"""
+    try:
+        legacy_file.rename(legacy_file.with_name(legacy_file.name + '.bad'))
+    except OSError:
+        pass
+
+
+class LyricsStore:
+    def __init__(self, path, max_bytes=512 * 1024 ** 2, memory_items=512, legacy_dir=None):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.legacy_dir = Path(legacy_dir) if legacy_dir else None
+        self._memory = OrderedDict()
+        self._memory_items = memory_items
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        db = self._connect()
+        with db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS lyrics ('
+                'video_id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS lyrics_accessed ON lyrics (accessed_at)')
+        self.bytes_used = db.execute('SELECT COALESCE(SUM(size), 0) FROM lyrics').fetchone()[0]
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _remember(self, video_id, data):
+        with self._lock:
+            self._memory[video_id] = data
+            self._memory.move_to_end(video_id)
+            while len(self._memory) > self._memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, video_id):
+        """Cached lyrics dict for video_id, or None"""
+        with self._lock:
+            data = self._memory.get(video_id)
+            if data is not None:
+                self._memory.move_to_end(video_id)
+                self.memory_hits += 1
+                return data
+
+        db = self._connect()
+        row = db.execute('SELECT data, accessed_at FROM lyrics WHERE video_id = ?', (video_id,)).fetchone()
+        if row is None:
+            data = self._import_legacy(video_id)
+            if data is None:
+                self.misses += 1
+            return data
+
+        self.disk_hits += 1
+        now = time.time()
+        if now - row[1] > TOUCH_INTERVAL:
+            with db:
+                db.execute('UPDATE lyrics SET accessed_at = ? WHERE video_id = ?', (now, video_id))
+        data = decode(row[0])
+        self._remember(video_id, data)
+        return data
+
+    def put(self, video_id, data):
+        blob = encode(data)
+        db = self._connect()
+        with self._lock:
+            with db:
+                old = db.execute('SELECT size FROM lyrics WHERE video_id = ?', (video_id,)).fetchone()
+                db.execute(
+                    'INSERT OR REPLACE INTO lyrics (video_id, data, size, accessed_at) VALUES (?, ?, ?, ?)',
+                    (video_id, blob, len(blob), time.time()),
+                )
+            self.bytes_used += len(blob) - (old[0] if old else 0)
+        self._remember(video_id, data)
+        if self.bytes_used > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently read lyrics until we're 10% under the cap"""
+        target = self.max_bytes * 0.9
+        db = self._connect()
+        with self._lock:
+            while self.bytes_used > target:
+                rows = db.execute('SELECT video_id, size FROM lyrics ORDER BY accessed_at LIMIT 256').fetchall()
+                if not rows:
+                    break
+                with db:
+                    db.executemany('DELETE FROM lyrics WHERE video_id = ?', [(r[0],) for r in rows])
+                for video_id, size in rows:
+                    self.bytes_used -= size
+                    self._memory.pop(video_id, None)
+                    self.evictions += 1
+
+    def _import_legacy(self, video_id):
+        if self.legacy_dir is None:
+            return None
+        legacy_file = self.legacy_dir / f'{video_id}.json'
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            quarantine(legacy_file)
+            return None
+        except OSError:
+            return None
+        self.put(video_id, data)
+        legacy_file.unlink(missing_ok=True)
+        return data
+
+    def migrate(self, directory=None, batch=500):
+        """Import every <video_id>.json in directory, deleting each once stored"""
+        directory = Path(directory) if directory else self.legacy_dir
+        if directory is None or not directory.is_dir():
+            return 0
+        db = self._connect()
+        imported = 0
+        rows, files = [], []
+
+        def flush():
+            with self._lock:
+                with db:
+                    db.executemany(
+                        'INSERT OR IGNORE INTO lyrics (video_id, data, size, accessed_at) VALUES (?, ?, ?, ?)', rows
+                    )
+                self.bytes_used = db.execute('SELECT COALESCE(SUM(size), 0) FROM lyrics').fetchone()[0]
+            for legacy_file in files:
+                legacy_file.unlink(missing_ok=True)
+            rows.clear()
+            files.clear()
+
+        for legacy_file in directory.glob('*.json'):
+            try:
+                with open(legacy_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except ValueError:
+                # Torn file from the old non-atomic writes
+                quarantine(legacy_file)
+                continue
+            except OSError:
+                continue
+            blob = encode(data)
+            rows.append((legacy_file.stem, blob, len(blob), legacy_file.stat().st_mtime))
+            files.append(legacy_file)
+            imported += 1
+            if len(rows) >= batch:
+                flush()
+        if rows:
+            flush()
+        if self.bytes_used > self.max_bytes:
+            self._evict()
+        return imported
+
+    def __contains__(self, video_id):
+        with self._lock:
+            if video_id in self._memory:
+                return True
+        row = self._connect().execute('SELECT 1 FROM lyrics WHERE video_id = ?', (video_id,)).fetchone()
+        return row is not None or (self.legacy_dir is not None and (self.legacy_dir / f'{video_id}.json').exists())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'memory_items': len(self._memory),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+if __name__ == '__main__':
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    target = sys.argv[2] if len(sys.argv) > 2 else (source / 'lyrics.sqlite3' if source else None)
+    if source is None:
+        print("usage: python lyrics_store.py <legacy json dir> [sqlite path]")
+        sys.exit(1)
+    start = time.perf_counter()
+    count = LyricsStore(target).migrate(source)
+    print(f"✓ Imported {count} lyrics files in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,184 @@
+"""Transcribe one song on several cores by cutting it at silences.
+
+faster-whisper decodes a song's 30 s windows one after another, so a single
+transcription keeps only cpu_threads busy however many cores the node has.
+ParallelTranscriber finds pauses with Silero VAD, cuts the audio there into
+roughly equal chunks and transcribes them in a process pool, one model per
+worker, with the language detected once and pinned. Segment starts are shifted
+by each chunk's offset, so the merged result looks like a sequential run.
+
+Cutting only where nobody sings keeps words from being split between chunks;
+bench_parallel_whisper.py compares the output with a sequential transcription.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+
+from whisper_profile import lyrics_lines
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+# Set in each pool worker by _init_worker
+_model = None
+_options = None
+
+
+def split_points(speech, total, chunks, min_samples, min_gap):
+    """(start, end) sample ranges for up to `chunks` pieces of `total` samples.
+
+    speech is the VAD's [{'start', 'end'}, ...] in samples. Cuts go in the
+    middle of pauses at least min_gap long, each one the pause closest to an
+    even split, and no piece is shorter than min_samples.
+    """
+    pauses = [
+        (a['end'] + b['start']) // 2
+        for a, b in zip(speech, speech[1:])
+        if b['start'] - a['end'] >= min_gap
+    ]
+    cuts = []
+    for i in range(1, chunks):
+        target = total * i // chunks
+        previous = cuts[-1] if cuts else 0
+        candidates = [p for p in pauses if p - previous >= min_samples and total - p >= min_samples]
+        if not candidates:
+            continue
+        cut = min(candidates, key=lambda p: abs(p - target))
+        if cut > previous:
+            cuts.append(cut)
+    bounds = [0] + cuts + [total]
+    return list(zip(bounds, bounds[1:]))
+
+
+def _init_worker(profile):
+    global _model, _options
+    _model = profile.load()
+    _options = profile.transcribe_options()
+
+
+def _ready(delay):
+    # Held briefly so every worker, not just the first one up, takes a task
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _transcribe_chunk(audio, offset, language):
+    """[{start, text}] for one chunk, with starts relative to the whole song"""
+    segments, _ = _model.transcribe(audio, language=language, word_timestamps=False, **_options)
+    return list(lyrics_lines(segments, offset))
+
+
+class ParallelTranscriber:
+    """Process pool that transcribes the chunks of one song concurrently.
+
+    Each worker loads its own copy of the model (memory grows with workers)
+    and gets cpu_count // workers CTranslate2 threads unless the profile sets
+    cpu_threads. Songs shorter than two min_chunk_seconds chunks are not
+    worth splitting; callers transcribe those sequentially.
+    """
+
+    def __init__(self, profile, workers, min_chunk_seconds=30, min_gap_seconds=0.3):
+        self.workers = workers
+        self.min_chunk_seconds = min_chunk_seconds
+        self.min_gap_seconds = min_gap_seconds
+        threads = profile.cpu_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.profile = replace(profile, cpu_threads=threads, num_workers=1)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.songs = 0
+        self.chunks = 0
+        self.broken = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                # spawn: forking a process that runs Flask threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.profile,),
+                )
+            return self._executor
+
+    def _discard(self, pool):
+        """Drop a broken pool; the next song starts a fresh one"""
+        with self._lock:
+            if self._executor is pool:
+                self._executor = None
+                self.broken += 1
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self):
+        """Start every worker and wait until each has loaded its model"""
+        pool = self._pool()
+        return set(pool.map(_ready, [0.5] * self.workers))
+
+    def should_split(self, audio):
+        return not isinstance(audio, str) and len(audio) >= 2 * self.min_chunk_seconds * SAMPLE_RATE
+
+    def split(self, audio, chunks=None):
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=int(self.min_gap_seconds * 1000)))
+        return split_points(
+            speech,
+            len(audio),
+            chunks or self.workers,
+            int(self.min_chunk_seconds * SAMPLE_RATE),
+            int(self.min_gap_seconds * SAMPLE_RATE),
+        )
+
+    def transcribe(self, audio, language, on_segment=None, chunks=None):
+        """[{start, text}] for the whole song, in order.
+
+        on_segment gets every segment of a chunk once that chunk and all
+        chunks before it are done, so streamed segments stay in order.
+        Raises BrokenProcessPool if a worker died (e.g. killed for memory);
+        the pool is replaced for the next song and the caller should
+        transcribe this one sequentially.
+        """
+        ranges = self.split(audio, chunks)
+        pool = self._pool()
+        segments = []
+        try:
+            futures = [
+                pool.submit(_transcribe_chunk, audio[start:end], start / SAMPLE_RATE, language)
+                for start, end in ranges
+            ]
+            with self._lock:
+                self.songs += 1
+                self.chunks += len(ranges)
+            log.debug("Transcribing %s chunks in parallel (language %s)", len(ranges), language)
+
+            for future in futures:
+                for segment in future.result():
+                    segments.append(segment)
+                    if on_segment:
+                        on_segment(segment)
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+        return segments
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'started': self._executor is not None,
+                'songs': self.songs,
+                'chunks': self.chunks,
+                'broken': self.broken,
+            }
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Warms the tracks likely to play next while the current one streams.
+
+    on_play(video_id) asks next_tracks(video_id) for upcoming ids and runs
+    warm(id) for the first `count` of them on a small thread pool. Work is
+    dropped rather than queued when the pool is saturated or the per-minute
+    budget is spent. claim(video_id) is called when a track is actually
+    requested, which gives the prefetch hit rate.
+    """
+
+    def __init__(self, next_tracks, warm, count=3, workers=2, rate_per_minute=60, remember=1000, ttl=3600):
+        self._next_tracks = next_tracks
+        self._warm = warm
+        self.count = count
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._pending = threading.BoundedSemaphore(workers * 4)
+        self._lock = threading.Lock()
+        self._rate = rate_per_minute / 60.0
+        self._capacity = max(1.0, float(count))
+        self._tokens = self._capacity
+        self._refilled = time.monotonic()
+        self._warmed = OrderedDict()
+        self._remember = remember
+        self._ttl = ttl
+        self.scheduled = 0
+        self.warmed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.hits = 0
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self._rate)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def on_play(self, video_id):
+        """Schedule prefetching for what follows video_id; never blocks"""
+        if not self._pending.acquire(blocking=False):
+            self.dropped += 1
+            return
+        self._executor.submit(self._run, video_id)
+
+    def _run(self, video_id):
+        try:
+            upcoming = [v for v in self._next_tracks(video_id) if v and v != video_id][:self.count]
+            for next_id in upcoming:
+                with self._lock:
+                    warmed_at = self._warmed.get(next_id)
+                    if warmed_at and time.time() - warmed_at < self._ttl:
+                        continue
+                    if not self._take_token():
+                        self.dropped += 1
+                        continue
+                    self.scheduled += 1
+                try:
+                    self._warm(next_id)
+                except Exception as e:
+                    self.failed += 1
+                    log.warning("Prefetch of %s failed: %s", next_id, e)
+                    continue
+                with self._lock:
+                    self.warmed += 1
+                    self._warmed[next_id] = time.time()
+                    self._warmed.move_to_end(next_id)
+                    while len(self._warmed) > self._remember:
+                        self._warmed.popitem(last=False)
+        except Exception as e:
+            self.failed += 1
+            log.warning("Prefetch after %s failed: %s", video_id, e)
+        finally:
+            self._pending.release()
+
+    def claim(self, video_id):
+        """Record that video_id started playing; True if it had been prefetched"""
+        with self._lock:
+            warmed_at = self._warmed.pop(video_id, None)
+            if warmed_at and time.time() - warmed_at < self._ttl:
+                self.hits += 1
+                return True
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'scheduled': self.scheduled,
+                'warmed': self.warmed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.warmed, 3) if self.warmed else None,
+            }
@@ -0,0 +1,164 @@
+"""Pre-transcribe lyrics for a batch of tracks into the lyrics store.
+
+Audio is fetched and decoded on a thread pool while N Whisper replicas run in
+separate processes, so downloads overlap with transcription and every core
+stays busy. Results land in the same cache that /api/lyrics reads.
+
+    python prewarm_lyrics.py dQw4w9WgXcQ fRyhqobl0sk
+    python prewarm_lyrics.py --file popular_ids.txt --replicas 4
+    python prewarm_lyrics.py --share 1b9d6a53f015
+
+--share takes the id from a /playlist/<share_id> link and reads the playlist
+from the configured share store (SHARE_STORE_BACKEND / SHARE_STORE_PATH).
+Each transcription is stored as soon as it finishes, so an interrupted run
+keeps everything done up to that point.
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from whisper_profile import WhisperProfile, lyrics_lines
+
+# Per-process model, set up once by _init_worker
+_model = None
+_options = None
+
+
+def _init_worker(profile_dict):
+    global _model, _options
+    profile = WhisperProfile(**profile_dict)
+    _model = profile.load()
+    _options = profile.transcribe_options()
+
+
+def _transcribe(audio):
+    start = time.perf_counter()
+    segments, info = _model.transcribe(audio, word_timestamps=False, **_options)
+    lyrics_segments = list(lyrics_lines(segments))
+    return info.language, info.duration, lyrics_segments, time.perf_counter() - start
+
+
+def collect_video_ids(args, share_store):
+    video_ids = list(args.video_ids)
+    if args.file:
+        with open(args.file) as f:
+            video_ids += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    for share_id in args.share:
+        share = share_store.get(share_id)
+        if share is None:
+            raise SystemExit(f"Playlist share not found: {share_id}")
+        video_ids += [t.get('videoId') or t.get('id') for t in share['playlist'].get('tracks', [])]
+    # Keep order, drop duplicates and blanks
+    return [v for v in dict.fromkeys(video_ids) if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video_ids', nargs='*')
+    parser.add_argument('--file', help='text file with one video_id per line')
+    parser.add_argument('--share', action='append', default=[], help='playlist share id (repeatable)')
+    parser.add_argument('--replicas', type=int, default=0, help='Whisper processes (default: CPUs / threads)')
+    parser.add_argument('--threads', type=int, default=0, help='cpu_threads per replica (default: 2)')
+    parser.add_argument('--downloads', type=int, default=4, help='concurrent audio downloads')
+    parser.add_argument('--force', action='store_true', help='re-transcribe tracks that are already cached')
+    args = parser.parse_args()
+
+    # Imported here so spawned workers don't pay for Flask/yt-dlp
+    import app
+
+    video_ids = collect_video_ids(args, app.share_store)
+    if not args.force:
+        video_ids = [v for v in video_ids if v not in app.lyrics_store]
+    if not video_ids:
+        print("Nothing to transcribe, everything is cached.")
+        return
+
+    cpus = os.cpu_count() or 1
+    threads = args.threads or 2
+    replicas = args.replicas or max(1, cpus // threads)
+    profile = WhisperProfile.from_env()
+    profile.cpu_threads = threads
+    profile.num_workers = 1
+
+    print(f"🎤 {len(video_ids)} tracks, {replicas} x {profile.model} replicas with {threads} threads, "
+          f"{args.downloads} downloaders")
+
+    # Bounds decoded audio held in memory to what the replicas can take next
+    slots = threading.Semaphore(replicas + args.downloads)
+
+    def fetch(video_id):
+        slots.acquire()
+        try:
+            start = time.perf_counter()
+            audio, audio_file = app.load_whisper_audio(video_id)
+            return audio, audio_file, time.perf_counter() - start
+        except Exception:
+            slots.release()
+            raise
+
+    wall_start = time.perf_counter()
+    done = failed = 0
+    audio_total = 0.0
+    pool = ProcessPoolExecutor(
+        max_workers=replicas,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(profile.as_dict(),),
+    )
+    with pool, ThreadPoolExecutor(max_workers=args.downloads) as downloader:
+        fetches = {downloader.submit(fetch, v): v for v in video_ids}
+        jobs = {}
+        # Downloads and transcriptions are waited on together, so each song is
+        # stored the moment its transcription finishes
+        while fetches or jobs:
+            finished, _ = wait([*fetches, *jobs], return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in fetches:
+                    video_id = fetches.pop(future)
+                    try:
+                        audio, audio_file, fetch_seconds = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"✗ {video_id}: download failed: {e}")
+                        continue
+                    job = pool.submit(_transcribe, audio)
+                    job.add_done_callback(lambda _: slots.release())
+                    jobs[job] = (video_id, audio_file, fetch_seconds)
+                    continue
+
+                video_id, audio_file, fetch_seconds = jobs.pop(future)
+                try:
+                    language, duration, lyrics_segments, run_seconds = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"✗ {video_id}: transcription failed: {e}")
+                    continue
+                finally:
+                    if audio_file:
+                        Path(audio_file).unlink(missing_ok=True)
+
+                app.write_cached_lyrics(video_id, {
+                    'lyrics': '\n'.join(s['text'] for s in lyrics_segments),
+                    'source': 'whisper_ai',
+                    'synced': True,
+                    'segments': lyrics_segments,
+                })
+                done += 1
+                audio_total += duration
+                print(f"✓ {video_id} [{language}] {duration:.0f}s audio: fetch {fetch_seconds:.1f}s, "
+                      f"transcribe {run_seconds:.1f}s (RTF {run_seconds / max(duration, 1):.2f}), "
+                      f"{len(lyrics_segments)} segments")
+
+    wall = time.perf_counter() - wall_start
+    print(f"\nDone: {done} transcribed, {failed} failed in {wall:.1f}s wall time")
+    if done:
+        print(f"Throughput: {done / wall * 3600:.0f} tracks/hour, "
+              f"{audio_total / wall:.1f}s of audio per wall-clock second")
+
+
+if __name__ == '__main__':
+    main()
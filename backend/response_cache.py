@@ -0,0 +1,231 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Per-process LRU (the default)"""
+
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at, ttl):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteBackend:
+    """Local SQLite file, shared by every gunicorn worker on the host"""
+
+    def __init__(self, path, max_size=2048):
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS response_cache ('
+                'key TEXT PRIMARY KEY, value TEXT, stored_at REAL, used_at REAL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS response_cache_used ON response_cache (used_at)')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        db = self._connect()
+        row = db.execute('SELECT value, stored_at FROM response_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with db:
+            db.execute('UPDATE response_cache SET used_at = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at, ttl):
+        db = self._connect()
+        with db:
+            db.execute(
+                'INSERT OR REPLACE INTO response_cache (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), stored_at, time.time()),
+            )
+            db.execute(
+                'DELETE FROM response_cache WHERE key IN ('
+                'SELECT key FROM response_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_size,),
+            )
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+
+class RedisBackend:
+    """Redis (or any Redis-compatible server); needs the optional redis package"""
+
+    def __init__(self, url, prefix='nova:', size_ttl=60):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self.size_ttl = size_ttl
+        self._size = None
+        self._size_at = 0.0
+
+    def get(self, key):
+        raw = self._redis.get(self._prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry['value'], entry['stored_at']
+
+    def set(self, key, value, stored_at, ttl):
+        # Redis expires keys itself; its maxmemory policy handles LRU
+        payload = json.dumps({'value': value, 'stored_at': stored_at})
+        self._redis.set(self._prefix + key, payload, ex=max(1, int(ttl)))
+
+    def __len__(self):
+        # Counting SCANs the whole keyspace, so it is redone at most once per
+        # size_ttl rather than on every /api/metrics scrape
+        now = time.monotonic()
+        if self._size is None or now - self._size_at >= self.size_ttl:
+            self._size = sum(1 for _ in self._redis.scan_iter(self._prefix + '*'))
+            self._size_at = now
+        return self._size
+
+
+def make_backend(kind='memory', url=None, max_size=2048):
+    if kind == 'sqlite':
+        return SqliteBackend(url or 'nova_cache.sqlite3', max_size=max_size)
+    if kind == 'redis':
+        return RedisBackend(url or 'redis://localhost:6379/0')
+    return MemoryBackend(max_size=max_size)
+
+
+class ResponseCache:
+    """TTL cache of formatted API responses with stale-while-revalidate.
+
+    Fresh entries (younger than ttl) are served as-is. Entries up to
+    ttl + stale_ttl old are still served, but a background refresh is
+    started so the next caller gets new data. Anything older is a miss;
+    concurrent misses for the same key share one compute() call.
+    """
+
+    def __init__(self, backend, stale_ttl=0, refresh_workers=2):
+        self.backend = backend
+        self.stale_ttl = stale_ttl
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='cache-refresh')
+        self._refreshing = set()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refresh_errors = 0
+
+    def get_or_compute(self, key, ttl, compute):
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                with self._lock:
+                    self.hits += 1
+                return value
+            if age < ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                self._refresh(key, ttl, compute)
+                return value
+
+        # Identical misses that arrive while one is computing wait for it
+        with self._lock:
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = {'event': threading.Event(), 'value': None, 'error': None}
+                self._inflight[key] = pending
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            pending['event'].wait()
+            if pending['error'] is not None:
+                raise pending['error']
+            return pending['value']
+
+        try:
+            value = compute()
+            self.backend.set(key, value, time.time(), ttl + self.stale_ttl)
+            pending['value'] = value
+            return value
+        except Exception as e:
+            pending['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending['event'].set()
+
+    def peek(self, key, ttl):
+        """Return a fresh or stale cached value without computing anything"""
+        entry = self.backend.get(key)
+        if entry is not None and time.time() - entry[1] < ttl + self.stale_ttl:
+            return entry[0]
+        return None
+
+    def _refresh(self, key, ttl, compute):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.backend.set(key, compute(), time.time(), ttl + self.stale_ttl)
+            except Exception as e:
+                with self._lock:
+                    self.refresh_errors += 1
+                log.warning("Background refresh of %s failed: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(run)
+
+    def stats(self):
+        size = len(self.backend)
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'size': size,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'refresh_errors': self.refresh_errors,
+            }
@@ -0,0 +1,137 @@
+import bisect
+import threading
+from collections import OrderedDict
+
+
+def tokenize(text):
+    return [t for t in ''.join(c if c.isalnum() else ' ' for c in text.lower()).split() if t]
+
+
+class PrefixIndex:
+    """Token-prefix index over recently seen tracks.
+
+    Every formatted track that passes through search or recommendations is
+    indexed by the words in its title, artists and album. A query matches a
+    track when each query word is a prefix of one of the track's words, so
+    "taylor s" finds "Taylor Swift" without calling YouTube Music.
+    """
+
+    def __init__(self, max_tracks=5000):
+        self.max_tracks = max_tracks
+        self._tracks = OrderedDict()
+        self._postings = {}
+        self._sorted_tokens = []
+        self._lock = threading.Lock()
+
+    def add(self, tracks):
+        with self._lock:
+            for track in tracks:
+                track_id = track.get('id')
+                if not track_id:
+                    continue
+                if track_id in self._tracks:
+                    self._tracks.move_to_end(track_id)
+                    continue
+                words = [track.get('name') or '']
+                words += [a.get('name', '') for a in track.get('artists', [])]
+                words.append(track.get('album', {}).get('name', ''))
+                tokens = set(tokenize(' '.join(words)))
+                self._tracks[track_id] = (tokens, track)
+                for token in tokens:
+                    if token not in self._postings:
+                        self._postings[token] = set()
+                        bisect.insort(self._sorted_tokens, token)
+                    self._postings[token].add(track_id)
+
+            while len(self._tracks) > self.max_tracks:
+                track_id, (tokens, _) = self._tracks.popitem(last=False)
+                for token in tokens:
+                    ids = self._postings[token]
+                    ids.discard(track_id)
+                    if not ids:
+                        del self._postings[token]
+                        i = bisect.bisect_left(self._sorted_tokens, token)
+                        del self._sorted_tokens[i]
+
+    def _ids_with_prefix(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self._sorted_tokens, prefix)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(prefix):
+            ids |= self._postings[self._sorted_tokens[i]]
+            i += 1
+        return ids
+
+    def search(self, query, limit=20):
+        """Most recently seen tracks matching every word of query"""
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            matches = None
+            for word in sorted(words, key=len, reverse=True):
+                ids = self._ids_with_prefix(word)
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+            results = []
+            for track_id in reversed(self._tracks):
+                if track_id in matches:
+                    results.append(self._tracks[track_id][1])
+                    if len(results) >= limit:
+                        break
+            return results
+
+    def __len__(self):
+        return len(self._tracks)
+
+
+class ClientSearches:
+    """Keeps one upstream search in flight per client.
+
+    Each request takes a ticket. While an earlier search from the same client
+    is still running, newer ones wait; once it finishes, only the newest
+    waiting ticket goes upstream and the older ones are reported superseded.
+    """
+
+    def __init__(self, max_clients=10000):
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.superseded = 0
+        self.timeouts = 0
+
+    def _client(self, client_id):
+        state = self._clients.get(client_id)
+        if state is None:
+            state = {'latest': 0, 'slot': threading.Lock()}
+            self._clients[client_id] = state
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        self._clients.move_to_end(client_id)
+        return state
+
+    def ticket(self, client_id):
+        with self._lock:
+            state = self._client(client_id)
+            state['latest'] += 1
+            return state, state['latest']
+
+    def acquire(self, state, ticket, timeout=30):
+        """Wait for the client's slot; False (slot not held) if superseded.
+
+        Raises TimeoutError if the client's previous search is still running
+        after timeout seconds.
+        """
+        if not state['slot'].acquire(timeout=timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError("Timed out waiting for this client's previous search")
+        if ticket != state['latest']:
+            state['slot'].release()
+            with self._lock:
+                self.superseded += 1
+            return False
+        return True
+
+    def release(self, state):
+        state['slot'].release()
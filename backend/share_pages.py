@@ -0,0 +1,119 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+TAG_RE = re.compile(r'{{([#/]?)(\w+)}}')
+
+
+class Template:
+    """A share-page template compiled once into literal/placeholder parts.
+
+    Supports {{name}} placeholders and {{#name}}...{{/name}} sections that
+    are only kept when name is truthy. Values are inserted as-is, exactly like
+    the str.replace chains this replaces; unknown placeholders are left in
+    the output untouched.
+    """
+
+    def __init__(self, text):
+        self.parts = self._compile(text)
+
+    @classmethod
+    def load(cls, path):
+        return cls(Path(path).read_text(encoding='utf-8'))
+
+    @staticmethod
+    def _compile(text):
+        root = []
+        stack = [(None, root)]
+        pos = 0
+        for match in TAG_RE.finditer(text):
+            parts = stack[-1][1]
+            if match.start() > pos:
+                parts.append(text[pos:match.start()])
+            kind, name = match.groups()
+            if kind == '#':
+                section = []
+                parts.append((name, section))
+                stack.append((name, section))
+            elif kind == '/' and stack[-1][0] == name:
+                stack.pop()
+            elif kind == '/':
+                parts.append(match.group(0))
+            else:
+                parts.append((name, match.group(0)))
+            pos = match.end()
+        stack[-1][1].append(text[pos:])
+        return root
+
+    def render(self, values):
+        out = []
+        self._render(self.parts, values, out)
+        return ''.join(out)
+
+    def _render(self, parts, values, out):
+        for part in parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            name, body = part
+            if isinstance(body, list):
+                if values.get(name):
+                    self._render(body, values, out)
+            else:
+                value = values.get(name)
+                out.append(body if value is None else str(value))
+
+
+class PageCache:
+    """Rendered share pages with the validators needed for 304 responses.
+
+    Each entry is (html, etag, last_modified, version). get() only returns
+    an entry whose version matches, so a re-shared playlist is re-rendered
+    without any explicit invalidation. Entries older than ttl are dropped.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['version'] != version or time.time() - entry['rendered_at'] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, html, last_modified=None, version=None):
+        body = html.encode('utf-8')
+        entry = {
+            'body': body,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'last_modified': last_modified or time.time(),
+            'rendered_at': time.time(),
+            'version': version,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'pages': len(self._entries), 'hits': self.hits, 'misses': self.misses}
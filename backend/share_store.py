@@ -0,0 +1,177 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Share ids are hex digests; anything else never touches the filesystem
+SHARE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class FileShareBackend:
+    """One JSON file per share under a two-character shard directory.
+
+    playlist_shares/1b/1b9d6a53f015.json keeps every directory small even
+    with millions of shares. Files from the old flat layout are still read.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._shards = set()
+
+    def _path(self, share_id):
+        return self.directory / share_id[:2] / f'{share_id}.json'
+
+    def load(self, share_id):
+        for path in (self._path(share_id), self.directory / f'{share_id}.json'):
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f), os.fstat(f.fileno()).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return None
+
+    def save(self, share_id, playlist):
+        path = self._path(share_id)
+        if path.parent not in self._shards:
+            path.parent.mkdir(exist_ok=True)
+            self._shards.add(path.parent)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(playlist, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return path.stat().st_mtime_ns
+
+    def delete(self, share_id):
+        self._path(share_id).unlink(missing_ok=True)
+        (self.directory / f'{share_id}.json').unlink(missing_ok=True)
+
+
+class SqliteShareBackend:
+    """All shares in one SQLite table, for hosts where many small files hurt"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        db = self._connect()
+        with db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS playlist_shares '
+                '(share_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at INTEGER NOT NULL)'
+            )
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+        return db
+
+    def load(self, share_id):
+        row = self._connect().execute(
+            'SELECT data, updated_at FROM playlist_shares WHERE share_id = ?', (share_id,)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, share_id, playlist):
+        version = time.time_ns()
+        db = self._connect()
+        with db:
+            db.execute(
+                'INSERT OR REPLACE INTO playlist_shares (share_id, data, updated_at) VALUES (?, ?, ?)',
+                (share_id, json.dumps(playlist), version),
+            )
+        return version
+
+    def delete(self, share_id):
+        db = self._connect()
+        with db:
+            db.execute('DELETE FROM playlist_shares WHERE share_id = ?', (share_id,))
+
+
+def make_share_backend(kind='file', path=None):
+    if kind == 'sqlite':
+        return SqliteShareBackend(path or 'playlist_shares.sqlite3')
+    return FileShareBackend(path or 'playlist_shares')
+
+
+class ShareStore:
+    """Shared playlists with an LRU of decoded playlists in front.
+
+    get() returns {'playlist', 'version'}; version changes whenever the
+    share is rewritten, so rendered pages can be cached against it. Cached
+    entries are re-read after ttl seconds so shares rewritten by another
+    worker process show up.
+    """
+
+    def __init__(self, backend, cache_size=1024, ttl=60):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, share_id, playlist, version):
+        entry = {'playlist': playlist, 'version': version, 'loaded_at': time.monotonic()}
+        with self._lock:
+            self._entries[share_id] = entry
+            self._entries.move_to_end(share_id)
+            while len(self._entries) > self.cache_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get(self, share_id):
+        if not SHARE_ID_RE.match(share_id):
+            return None
+        with self._lock:
+            entry = self._entries.get(share_id)
+            if entry is not None and time.monotonic() - entry['loaded_at'] < self.ttl:
+                self._entries.move_to_end(share_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        loaded = self.backend.load(share_id)
+        if loaded is None:
+            return None
+        return self._remember(share_id, *loaded)
+
+    def put(self, share_id, playlist):
+        if not SHARE_ID_RE.match(share_id):
+            raise ValueError(f"Invalid share id: {share_id}")
+        return self._remember(share_id, playlist, self.backend.save(share_id, playlist))
+
+    def delete(self, share_id):
+        with self._lock:
+            self._entries.pop(share_id, None)
+        self.backend.delete(share_id)
+
+    def page(self, share_id, offset=0, limit=None):
+        """The playlist with only tracks[offset:offset + limit], or None"""
+        entry = self.get(share_id)
+        if entry is None:
+            return None
+        playlist = entry['playlist']
+        tracks = playlist.get('tracks', [])
+        end = len(tracks) if limit is None else offset + limit
+        return {
+            **playlist,
+            'tracks': tracks[offset:end],
+            'total_tracks': len(tracks),
+            'offset': offset,
+            'next_offset': end if end < len(tracks) else None,
+        }
+
+    def stats(self):
+        with self._lock:
+            return {'cached': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,235 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+API_URL = 'https://api.spotify.com/v1'
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+# /v1/tracks?ids= takes at most this many ids per call
+BATCH_SIZE = 50
+# Spotify ids are 22 base62 characters; anything else never reaches the API
+TRACK_ID_RE = re.compile(r'[A-Za-z0-9]{22}')
+
+
+def valid_track_id(track_id):
+    return isinstance(track_id, str) and TRACK_ID_RE.fullmatch(track_id) is not None
+
+
+class SpotifyToken:
+    """Bearer token for server-side Spotify lookups.
+
+    With a client id and secret the server fetches its own client-credentials
+    token and refreshes it in the background `margin` seconds before it
+    expires, so lookups never wait on a refresh. Without them it uses the
+    last token pushed through /api/set-token (or SPOTIFY_TOKEN) until that
+    token's expiry.
+    """
+
+    def __init__(self, session, client_id=None, client_secret=None, static_token=None, margin=300):
+        self._session = session
+        self._credentials = (client_id, client_secret) if client_id and client_secret else None
+        self.margin = margin
+        self._token = static_token
+        # A static token's age is unknown; trust it until a lookup gets a 401
+        self._expires_at = float('inf') if static_token else 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self.refreshes = 0
+
+    def set(self, token, expires_in=3600):
+        with self._lock:
+            self._token = token
+            self._expires_at = time.time() + expires_in
+
+    def _refresh(self):
+        resp = self._session.post(
+            TOKEN_URL, data={'grant_type': 'client_credentials'}, auth=self._credentials, timeout=10
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        self.set(data['access_token'], data.get('expires_in', 3600))
+        self.refreshes += 1
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        except Exception as e:
+            log.warning("Spotify token refresh failed: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        """A usable token, or None when there is no way to get one"""
+        with self._lock:
+            token, remaining = self._token, self._expires_at - time.time()
+            if self._credentials is None or remaining > self.margin:
+                return token if remaining > 0 else None
+            if remaining > 0:
+                # Still valid: keep using it while a new one is fetched
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background, daemon=True).start()
+                return token
+        # Expired (or never fetched): callers wait for a single refresh
+        with self._refresh_lock:
+            with self._lock:
+                if self._expires_at - time.time() > self.margin:
+                    return self._token
+            self._refresh()
+            with self._lock:
+                return self._token
+
+    def invalidate(self, token):
+        """Drop token after Spotify rejected it with a 401"""
+        with self._lock:
+            if self._token == token:
+                self._expires_at = 0
+
+    def stats(self):
+        with self._lock:
+            remaining = self._expires_at - time.time()
+            return {
+                'source': 'client_credentials' if self._credentials else ('pushed' if self._token else None),
+                'expires_in': None if remaining == float('inf') else max(0, int(remaining)),
+                'refreshes': self.refreshes,
+            }
+
+
+class SpotifyTracks:
+    """TTL cache of Spotify track metadata keyed by track id.
+
+    Unknown ids (null in the /v1/tracks response) are cached for
+    negative_ttl so crawlers hitting a dead share link don't reach Spotify.
+    Concurrent misses for the same id share one request, and get_many()
+    fetches every missing id through /v1/tracks?ids= in batches of 50.
+    """
+
+    def __init__(self, session, token, ttl=24 * 3600, negative_ttl=600, max_size=4096):
+        self._session = session
+        self._token = token
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.requests = 0
+
+    def _cached(self, track_id):
+        """(True, track-or-None) for a live entry, else (False, None); caller holds the lock"""
+        entry = self._entries.get(track_id)
+        if entry is None:
+            return False, None
+        if entry['expires_at'] <= time.time():
+            del self._entries[track_id]
+            return False, None
+        self._entries.move_to_end(track_id)
+        return True, entry['track']
+
+    def _store(self, track_id, track):
+        ttl = self.ttl if track is not None else self.negative_ttl
+        with self._lock:
+            self._entries[track_id] = {'track': track, 'expires_at': time.time() + ttl}
+            self._entries.move_to_end(track_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _request(self, path, params=None):
+        """GET an API path, retrying once with a fresh token after a 401"""
+        for attempt in range(2):
+            token = self._token.get()
+            if not token:
+                raise LookupError('No Spotify token available')
+            self.requests += 1
+            resp = self._session.get(
+                f'{API_URL}{path}', params=params, headers={'Authorization': f'Bearer {token}'}, timeout=10
+            )
+            if resp.status_code == 401 and attempt == 0:
+                self._token.invalidate(token)
+                continue
+            return resp
+        return resp
+
+    def _fetch(self, track_ids):
+        """{id: track or None} straight from Spotify, storing every answer"""
+        found = {}
+        for i in range(0, len(track_ids), BATCH_SIZE):
+            # Ids only ever go in the query string, never the URL path
+            batch = track_ids[i:i + BATCH_SIZE]
+            resp = self._request('/tracks', params={'ids': ','.join(batch)})
+            resp.raise_for_status()
+            for track_id, track in zip(batch, resp.json().get('tracks', [])):
+                found[track_id] = track
+        for track_id, track in found.items():
+            self._store(track_id, track)
+        return found
+
+    def get(self, track_id):
+        """Track metadata, or None if Spotify doesn't know the id"""
+        return self.get_many([track_id])[track_id]
+
+    def get_many(self, track_ids):
+        """{id: track or None} for a batch, fetching only uncached ids.
+
+        Raises ValueError if any id isn't a Spotify track id.
+        """
+        invalid = [t for t in track_ids if not valid_track_id(t)]
+        if invalid:
+            raise ValueError(f"Invalid Spotify track id: {invalid[0]!r}")
+        results = {}
+        owned = []
+        waiting = {}
+        with self._lock:
+            for track_id in dict.fromkeys(track_ids):
+                cached, track = self._cached(track_id)
+                if cached:
+                    self.hits += 1
+                    results[track_id] = track
+                elif track_id in self._inflight:
+                    self.coalesced += 1
+                    waiting[track_id] = self._inflight[track_id]
+                else:
+                    self.misses += 1
+                    pending = {'event': threading.Event(), 'track': None, 'error': None}
+                    self._inflight[track_id] = pending
+                    owned.append(track_id)
+
+        if owned:
+            try:
+                found = self._fetch(owned)
+                for track_id in owned:
+                    self._inflight[track_id]['track'] = results[track_id] = found.get(track_id)
+            except Exception as e:
+                for track_id in owned:
+                    self._inflight[track_id]['error'] = e
+                raise
+            finally:
+                with self._lock:
+                    for track_id in owned:
+                        self._inflight.pop(track_id)['event'].set()
+
+        for track_id, pending in waiting.items():
+            pending['event'].wait()
+            if pending['error'] is not None:
+                raise pending['error']
+            results[track_id] = pending['track']
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'requests': self.requests,
+                'inflight': len(self._inflight),
+            }
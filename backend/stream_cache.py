@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+# Fallback lifetime when a resolved URL carries no expire= parameter
+DEFAULT_TTL = 30 * 60
+# Drop entries a bit before googlevideo does so a long song can still finish
+EXPIRY_MARGIN = 5 * 60
+
+
+def url_expiry(url, default_ttl=DEFAULT_TTL):
+    """Return the unix time a googlevideo URL stops working"""
+    try:
+        parsed = urlparse(url)
+        expire = parse_qs(parsed.query).get('expire')
+        if expire:
+            return int(expire[0])
+        # Manifest-style URLs put parameters in the path: /expire/1700000000/
+        parts = parsed.path.split('/')
+        if 'expire' in parts:
+            return int(parts[parts.index('expire') + 1])
+    except (ValueError, IndexError):
+        pass
+    return time.time() + default_ttl
+
+
+class StreamUrlCache:
+    """Bounded LRU of resolved audio URLs keyed by video_id.
+
+    Entries expire together with the signed URL they hold. Concurrent misses
+    for the same video_id wait on a single resolve() call instead of each
+    running their own extraction.
+    """
+
+    def __init__(self, resolve, max_size=512, margin=EXPIRY_MARGIN):
+        self._resolve = resolve
+        self.max_size = max_size
+        self.margin = margin
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, video_id):
+        """Return the cached entry for video_id, resolving it on a miss"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None:
+                if entry['expires_at'] - self.margin > time.time():
+                    self._entries.move_to_end(video_id)
+                    self.hits += 1
+                    return entry
+                del self._entries[video_id]
+
+            pending = self._inflight.get(video_id)
+            if pending is None:
+                pending = {'event': threading.Event(), 'entry': None, 'error': None}
+                self._inflight[video_id] = pending
+                self.misses += 1
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if not owner:
+            pending['event'].wait()
+            if pending['error'] is not None:
+                raise pending['error']
+            return pending['entry']
+
+        try:
+            entry = self._resolve(video_id)
+            entry['expires_at'] = url_expiry(entry['url'])
+            pending['entry'] = entry
+            with self._lock:
+                self._entries[video_id] = entry
+                self._entries.move_to_end(video_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            return entry
+        except Exception as e:
+            pending['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(video_id, None)
+            pending['event'].set()
+
+    def invalidate(self, video_id):
+        """Forget video_id, e.g. after upstream rejected its URL"""
+        with self._lock:
+            self._entries.pop(video_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'inflight': len(self._inflight),
+            }
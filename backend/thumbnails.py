@@ -0,0 +1,141 @@
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Best first; hqdefault exists for every video, so it is the safe fallback
+QUALITIES = ['maxresdefault', 'sddefault', 'hqdefault', 'mqdefault', 'default']
+FALLBACK_QUALITY = 'hqdefault'
+# YouTube video ids are 11 characters of [A-Za-z0-9_-]
+VIDEO_ID_RE = re.compile(r'[\w-]{11}', re.ASCII)
+
+
+def valid_video_id(video_id):
+    return isinstance(video_id, str) and VIDEO_ID_RE.fullmatch(video_id) is not None
+
+
+def thumbnail_url(video_id, quality=FALLBACK_QUALITY):
+    return f'https://i.ytimg.com/vi/{video_id}/{quality}.jpg'
+
+
+class ThumbnailResolver:
+    """Finds the best existing thumbnail quality per video and remembers it.
+
+    All qualities are probed at once with HEAD requests and the best one that
+    answers 200 wins. Results are kept in memory and in a SQLite file, so a
+    video is only ever probed once across restarts.
+    """
+
+    def __init__(self, session, db_path=None, timeout=5, workers=16):
+        self._session = session
+        self.timeout = timeout
+        # `workers` videos at a time, each probing every quality in parallel
+        self._probes = ThreadPoolExecutor(max_workers=workers * len(QUALITIES), thread_name_prefix='thumb-probe')
+        self._videos = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumb')
+        self._known = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False, timeout=5)
+            with self._db:
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS thumbnails (video_id TEXT PRIMARY KEY, quality TEXT, checked_at REAL)'
+                )
+        self.hits = 0
+        self.probed = 0
+
+    def known(self, video_id):
+        """Cached best quality for video_id, or None (never probes)"""
+        with self._lock:
+            quality = self._known.get(video_id)
+            if quality is None and self._db is not None:
+                row = self._db.execute('SELECT quality FROM thumbnails WHERE video_id = ?', (video_id,)).fetchone()
+                if row:
+                    quality = self._known[video_id] = row[0]
+            return quality
+
+    def _probe(self, video_id, quality):
+        try:
+            resp = self._session.head(thumbnail_url(video_id, quality), timeout=self.timeout)
+            return resp.status_code == 200
+        except Exception:
+            return None
+
+    def _resolve(self, video_id):
+        futures = [self._probes.submit(self._probe, video_id, q) for q in QUALITIES]
+        quality = None
+        errors = False
+        # Take the best quality that exists without waiting on worse ones
+        for q, future in zip(QUALITIES, futures):
+            ok = future.result()
+            if ok:
+                quality = q
+                break
+            errors = errors or ok is None
+        with self._lock:
+            self.probed += 1
+            self._inflight.pop(video_id, None)
+            # Only remember definite answers: a better quality that timed out
+            # might still exist
+            if not errors:
+                quality = quality or FALLBACK_QUALITY
+                self._known[video_id] = quality
+                if self._db is not None:
+                    with self._db:
+                        self._db.execute(
+                            'INSERT OR REPLACE INTO thumbnails (video_id, quality, checked_at) VALUES (?, ?, ?)',
+                            (video_id, quality, time.time()),
+                        )
+        return quality or FALLBACK_QUALITY
+
+    def _submit(self, video_id):
+        with self._lock:
+            future = self._inflight.get(video_id)
+            if future is None:
+                future = self._inflight[video_id] = self._videos.submit(self._resolve, video_id)
+            return future
+
+    def resolve(self, video_id):
+        """Best thumbnail URL for one video, probing if it isn't cached.
+
+        Anything that isn't a video id gets the fallback URL without a probe,
+        so arbitrary input never ends up in the cache.
+        """
+        if not valid_video_id(video_id):
+            return thumbnail_url(video_id)
+        quality = self.known(video_id)
+        if quality is not None:
+            self.hits += 1
+            return thumbnail_url(video_id, quality)
+        return thumbnail_url(video_id, self._submit(video_id).result())
+
+    def resolve_many(self, video_ids, timeout=None):
+        """{video_id: url} for a whole page, probing uncached ids concurrently.
+
+        Ids still being probed when timeout runs out get the fallback URL;
+        their probes keep running so the next page load has the answer.
+        """
+        results = {}
+        pending = {}
+        for video_id in dict.fromkeys(v for v in video_ids if v):
+            if not valid_video_id(video_id):
+                results[video_id] = thumbnail_url(video_id)
+                continue
+            quality = self.known(video_id)
+            if quality is not None:
+                self.hits += 1
+                results[video_id] = thumbnail_url(video_id, quality)
+            else:
+                pending[video_id] = self._submit(video_id)
+        if pending:
+            wait(pending.values(), timeout=timeout)
+        for video_id, future in pending.items():
+            quality = future.result() if future.done() else FALLBACK_QUALITY
+            results[video_id] = thumbnail_url(video_id, quality)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {'known': len(self._known), 'hits': self.hits, 'probed': self.probed}
@@ -0,0 +1,148 @@
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder produces the same JSON, slower
+    orjson = None
+
+# Top-level keys of a track payload, in order; ?fields= picks from these
+TRACK_FIELDS = ('id', 'name', 'artists', 'album', 'duration_ms', 'uri', 'preview_url', 'external_urls')
+
+
+def _fallback_image(thumbnails):
+    """Largest YouTube Music thumbnail with its =w/=s size suffix removed"""
+    if not thumbnails:
+        return ''
+    url = thumbnails[-1]['url']
+    if '=w' in url or '=s' in url:
+        url = url.split('=w')[0].split('=s')[0]
+    return url
+
+
+class Track:
+    """One YouTube Music song, reduced to what the Spotify-shaped payload needs.
+
+    The payload dict is built on first use and shared by every response that
+    contains the track, so it must be treated as read-only.
+    """
+
+    __slots__ = ('video_id', 'name', 'artists', 'album', 'image_url', 'duration_ms', '_payload')
+
+    def __init__(self, video_id, name, artists, album, image_url, duration_ms):
+        self.video_id = video_id
+        self.name = name
+        self.artists = artists
+        self.album = album
+        self.image_url = image_url
+        self.duration_ms = duration_ms
+        self._payload = None
+
+    @classmethod
+    def from_ytmusic(cls, raw, image_url):
+        album = raw.get('album')
+        duration = raw.get('duration_seconds')
+        return cls(
+            raw.get('videoId'),
+            raw.get('title'),
+            tuple(artist['name'] for artist in raw.get('artists') or ()),
+            album.get('name', 'Unknown Album') if album else 'Unknown Album',
+            image_url,
+            duration * 1000 if duration else 0,
+        )
+
+    def payload(self):
+        if self._payload is None:
+            video_id = self.video_id
+            self._payload = {
+                'id': video_id,
+                'name': self.name,
+                'artists': [{'name': name} for name in self.artists],
+                'album': {
+                    'name': self.album,
+                    'images': [{'url': self.image_url, 'height': 640, 'width': 640}],
+                },
+                'duration_ms': self.duration_ms,
+                'uri': f'ytmusic:{video_id}',
+                'preview_url': None,
+                'external_urls': {'youtube': f'https://music.youtube.com/watch?v={video_id}'},
+            }
+        return self._payload
+
+
+class TrackTable:
+    """LRU of normalized tracks by videoId, shared by search and recommendations.
+
+    A popular song shows up in many searches and watch playlists; its payload
+    is built once and reused until the title or resolved thumbnail changes.
+    """
+
+    def __init__(self, max_size=20000):
+        self.max_size = max_size
+        self._tracks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def normalize(self, raw, image_url=None):
+        """Payload dict for one ytmusicapi result.
+
+        image_url is the resolved thumbnail; without it (or without a videoId
+        to resolve one for) the largest thumbnail listed in the result is used.
+        """
+        video_id = raw.get('videoId')
+        if image_url is None or not video_id:
+            image_url = _fallback_image(raw.get('thumbnails') or raw.get('thumbnail'))
+        if not video_id:
+            return Track.from_ytmusic(raw, image_url).payload()
+
+        with self._lock:
+            track = self._tracks.get(video_id)
+            if track is not None and track.name == raw.get('title') and track.image_url == image_url:
+                self._tracks.move_to_end(video_id)
+                self.hits += 1
+                return track.payload()
+            self.misses += 1
+
+        track = Track.from_ytmusic(raw, image_url)
+        payload = track.payload()
+        with self._lock:
+            self._tracks[video_id] = track
+            self._tracks.move_to_end(video_id)
+            while len(self._tracks) > self.max_size:
+                self._tracks.popitem(last=False)
+        return payload
+
+    def normalize_many(self, results, thumbnails):
+        """Payloads for a page of results, thumbnails being {video_id: url}"""
+        return [self.normalize(raw, thumbnails.get(raw.get('videoId'))) for raw in results]
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._tracks), 'hits': self.hits, 'misses': self.misses}
+
+
+def parse_fields(value):
+    """Known payload keys named in a ?fields=id,name,... value, or None for all"""
+    if not value:
+        return None
+    fields = tuple(f for f in (part.strip() for part in value.split(',')) if f in TRACK_FIELDS)
+    return fields or None
+
+
+def project(tracks, fields):
+    """tracks with only the given top-level keys (all of them when fields is None)"""
+    if fields is None:
+        return tracks
+    return [{key: track[key] for key in fields if key in track} for track in tracks]
+
+
+def dumps(obj):
+    """Compact JSON as bytes, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,169 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TranscriptionQueue:
+    """Runs Whisper jobs on a bounded thread pool.
+
+    Threads (not processes) so every worker shares the one loaded model.
+    Submitting a video_id that is already queued or running returns the
+    existing job instead of starting a second transcription. Segments are
+    recorded on the job as they are decoded so follow() can stream them.
+    """
+
+    def __init__(self, run_job, max_workers=1, keep_finished=256):
+        self._run_job = run_job
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='whisper')
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._keep_finished = keep_finished
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def submit(self, video_id):
+        """Queue a transcription, returning the (possibly existing) job"""
+        with self._lock:
+            job_id = self._active.get(video_id)
+            if job_id is not None:
+                self.deduplicated += 1
+                return self._public(self._jobs[job_id])
+
+            job = {
+                'job_id': uuid.uuid4().hex[:12],
+                'video_id': video_id,
+                'status': 'queued',
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None,
+                'segments': [],
+            }
+            self._jobs[job['job_id']] = job
+            self._active[video_id] = job['job_id']
+            self.submitted += 1
+            self._trim()
+
+        job['future'] = self._executor.submit(self._run, job)
+        return self._public(job)
+
+    def _run(self, job):
+        with self._lock:
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+        try:
+            result = self._run_job(job['video_id'], lambda segment: self._add_segment(job, segment))
+            with self._lock:
+                job['result'] = result
+                job['status'] = 'done'
+                self.completed += 1
+        except Exception as e:
+            with self._lock:
+                job['error'] = str(e)
+                job['status'] = 'error'
+                self.failed += 1
+        finally:
+            with self._lock:
+                job['finished_at'] = time.time()
+                self._total_wait += job['started_at'] - job['submitted_at']
+                self._total_run += job['finished_at'] - job['started_at']
+                self._active.pop(job['video_id'], None)
+                self._changed.notify_all()
+
+    def _add_segment(self, job, segment):
+        with self._lock:
+            job['segments'].append(segment)
+            self._changed.notify_all()
+
+    def follow(self, job_id):
+        """Yield a job's segments as they arrive, then the finished job"""
+        sent = 0
+        while True:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                while len(job['segments']) == sent and job['status'] not in ('done', 'error'):
+                    self._changed.wait()
+                pending = job['segments'][sent:]
+                finished = self._public(job) if job['status'] in ('done', 'error') else None
+            sent += len(pending)
+            yield from pending
+            if finished:
+                yield finished
+                return
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j['status'] in ('done', 'error')]
+        for jid in finished[:max(0, len(self._jobs) - self._keep_finished)]:
+            del self._jobs[jid]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def find(self, video_id):
+        """Return the queued or running job for video_id, if any"""
+        with self._lock:
+            job_id = self._active.get(video_id)
+            return self._public(self._jobs[job_id]) if job_id else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes (for callers that still want a sync answer)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job.get('future')
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self.get(job_id)
+
+    def _public(self, job):
+        now = time.time()
+        started = job['started_at']
+        finished = job['finished_at']
+        data = {
+            'job_id': job['job_id'],
+            'video_id': job['video_id'],
+            'status': job['status'],
+            'queued_seconds': round((started or now) - job['submitted_at'], 3),
+            'run_seconds': round((finished or now) - started, 3) if started else None,
+            'segments_decoded': len(job['segments']),
+        }
+        if job['status'] == 'done':
+            data['result'] = job['result']
+        elif job['status'] == 'error':
+            data['error'] = job['error']
+        return data
+
+    def stats(self):
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j['status'] == 'queued')
+            running = sum(1 for j in self._jobs.values() if j['status'] == 'running')
+            finished = self.completed + self.failed
+            return {
+                'workers': self.max_workers,
+                'queue_depth': queued,
+                'running': running,
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_queue_seconds': round(self._total_wait / finished, 3) if finished else None,
+                'avg_run_seconds': round(self._total_run / finished, 3) if finished else None,
+            }
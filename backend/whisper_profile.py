@@ -0,0 +1,66 @@
+import os
+from dataclasses import dataclass, asdict
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def lyrics_lines(segments, offset=0.0):
+    """{start, text} for each non-empty faster-whisper segment.
+
+    Every transcription path formats its segments here, so a song gets the
+    same timestamps (seconds, rounded to ms) whichever way it was transcribed.
+    """
+    for segment in segments:
+        text = segment.text.strip()
+        if text:
+            yield {'start': round(segment.start + offset, 3), 'text': text}
+
+
+@dataclass
+class WhisperProfile:
+    """Model size and compute settings for faster-whisper.
+
+    Models: tiny (fastest) < base (balanced) < small (best accuracy but slower).
+    cpu_threads=0 lets CTranslate2 pick; num_workers is how many transcribe()
+    calls the one model can run at the same time.
+    """
+    model: str = 'base'
+    device: str = 'cpu'
+    compute_type: str = 'int8'
+    cpu_threads: int = 0
+    num_workers: int = 1
+    beam_size: int = 5
+    vad_filter: bool = False
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            model=os.environ.get('WHISPER_MODEL', cls.model),
+            device=os.environ.get('WHISPER_DEVICE', cls.device),
+            compute_type=os.environ.get('WHISPER_COMPUTE_TYPE', cls.compute_type),
+            cpu_threads=int(os.environ.get('WHISPER_CPU_THREADS', cls.cpu_threads)),
+            num_workers=int(os.environ.get('WHISPER_NUM_WORKERS', os.environ.get('WHISPER_WORKERS', cls.num_workers))),
+            beam_size=int(os.environ.get('WHISPER_BEAM_SIZE', cls.beam_size)),
+            vad_filter=_env_bool('WHISPER_VAD_FILTER', cls.vad_filter),
+        )
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        return WhisperModel(
+            self.model,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.num_workers,
+        )
+
+    def transcribe_options(self):
+        return {'beam_size': self.beam_size, 'vad_filter': self.vad_filter}
+
+    def as_dict(self):
+        return asdict(self)
@@ -14,24 +14,43 @@ export default function SearchBar({ token, onTrackSelect, onOpenSettings, onOpen
       return;
     }
 
+    const controller = new AbortController();
+
+    // Quick local matches from tracks the backend has already seen
+    const instantSearch = setTimeout(async () => {
+      if (!useYTMusic) return;
+      try {
+        const data = await searchTracksYTMusic(query, { instant: true, signal: controller.signal });
+        const items = data.tracks?.items || [];
+        if (items.length > 0) setResults(items);
+      } catch (error) {
+        if (error.name !== 'AbortError') console.error('Search error:', error);
+      }
+    }, 150);
+
     const delayDebounce = setTimeout(async () => {
       setIsSearching(true);
       try {
         let data;
         if (useYTMusic) {
-          data = await searchTracksYTMusic(query);
+          data = await searchTracksYTMusic(query, { signal: controller.signal });
+          if (data.superseded) return;
         } else {
           data = await searchTracks(query, token);
         }
         setResults(data.tracks?.items || []);
       } catch (error) {
-        console.error('Search error:', error);
+        if (error.name !== 'AbortError') console.error('Search error:', error);
       } finally {
-        setIsSearching(false);
+        if (!controller.signal.aborted) setIsSearching(false);
       }
     }, 500); // Wait 500ms after user stops typing
 
-    return () => clearTimeout(delayDebounce);
+    return () => {
+      clearTimeout(instantSearch);
+      clearTimeout(delayDebounce);
+      controller.abort();
+    };
   }, [query, token, useYTMusic]);
 
   const handleTrackClick = (track) => {
@@ -346,14 +346,37 @@ export default function YTMusicPlayer({
       const backendUrl = import.meta.env.VITE_BACKEND_URL || `http://${window.location.hostname}:5001`;
       console.log('🎤 Starting Whisper transcription...');
       
-      const response = await fetch(`${backendUrl}/api/lyrics/${videoId}/transcribe`, {
+      // Segments stream back as NDJSON so lines appear while Whisper is still decoding
+      const response = await fetch(`${backendUrl}/api/lyrics/${videoId}/transcribe?stream=1`, {
         method: 'POST'
       });
       
-      const data = await response.json();
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      const streamedSegments = [];
+      let buffer = '';
+      let data = null;
       
-      if (data.error) {
-        setLyrics('AI transcription failed. ' + data.error);
+      while (!data) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const message = JSON.parse(line);
+          if (message.type === 'segment') {
+            streamedSegments.push({ start: message.start, text: message.text });
+            setLyricsSegments([...streamedSegments]);
+          } else {
+            data = message;
+          }
+        }
+      }
+      
+      if (!data || data.error) {
+        setLyrics('AI transcription failed. ' + (data?.error || ''));
         setIsTranscribing(false);
       } else {
         setLyrics(data.lyrics);
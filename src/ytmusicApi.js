@@ -7,8 +7,13 @@ const getBackendUrl = () => {
 
 const BACKEND_URL = getBackendUrl();
 
-export const searchTracksYTMusic = async (query) => {
-  const response = await fetch(`${BACKEND_URL}/api/search?q=${encodeURIComponent(query)}`);
+// Lets the backend drop this tab's superseded search-as-you-type queries
+const SEARCH_CLIENT_ID = Math.random().toString(36).slice(2);
+
+export const searchTracksYTMusic = async (query, { instant = false, signal } = {}) => {
+  const params = new URLSearchParams({ q: query, client: SEARCH_CLIENT_ID });
+  if (instant) params.set('instant', '1');
+  const response = await fetch(`${BACKEND_URL}/api/search?${params}`, { signal });
   if (!response.ok) {
     throw new Error('Search failed');
   }